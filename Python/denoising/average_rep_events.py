@@ -3,39 +3,101 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from numpy.lib.stride_tricks import sliding_window_view
+
 # FUNCTION
 
-def average_rep_events(signal, dur, onset, plotting=None):
+def average_rep_events(signal, dur, onset, plotting=None, edge=None, axis=None):
     '''
     Restructures a time series composed of repetitive events into a matrix and calculate the corresponding average.
         Note: this code assumes that each event has a constant duration.
+        Note: when the onsets are evenly spaced (and all events are within the signal), data_matrix is a read-only view of signal (no copy). Otherwise, all events are gathered at once into a new array.
     Input:
-        signal: nx1 array corresponding to the tested time series
+        signal: nx1 array corresponding to the tested time series, or nxk array corresponding to k channels (events extracted along axis)
         dur: duration of each event (in frames)
         onset: mx1 array corresponding to the frame numbers when each event happens (when m = number of events in the signal)
         plotting: set to 1 if you wish to see the resulting resulting restructured matrix [default = 0]
+        edge: select how events that are not fully included in the signal are handled
+            'drop': remove corresponding events [default]
+            'pad': keep corresponding events and fill missing frames with NaN
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
     Output:
-        data_matrix: nxm array corresponding to the restructured matrix
-        plot (optional): plot showing the restructured matrix
+        data_matrix: mxdur array (or mxdurxk array for multiple channels) corresponding to the restructured matrix
+        plot (optional): plot showing the restructured matrix (first channel)
     Dependencies:
         None
     '''
     # Deal with default values and potential missing input variables
     if plotting == None:
         plotting = 0
+    if edge == None:
+        edge = 'drop'
+    if axis == None:
+        axis = 0
+    # Move time axis to the front
+    data = np.moveaxis(np.asarray(signal), axis, 0)
+    n = np.shape(data)[0]
+    onset = np.asarray(onset, dtype=int)
+    # Find events that are not fully included in the signal
+    inside = (onset >= 0) & (onset + dur <= n)
+    if edge == 'drop':
+        onset = onset[inside]
+    elif edge == 'pad':
+        if not np.all(inside):
+            # pad signal with NaN on each side, then shift onsets accordingly
+            pre = max(0, -np.min(onset))
+            post = max(0, np.max(onset) + dur - n)
+            data = np.concatenate((np.full((pre,) + np.shape(data)[1:], np.nan), data, np.full((post,) + np.shape(data)[1:], np.nan)))
+            onset = onset + pre
+    else:
+        raise ValueError('Unknown edge policy: ' + str(edge))
     # Calculate number of events
     num_events = len(onset)
-    # Initialize matrix
-    data_matrix = np.zeros((num_events, dur))
     # Restructure data into matrix
-    for i in range(0,num_events):
-        data_matrix[i,:] = signal[onset[i]:onset[i]+dur]
+    step = onset[1]-onset[0] if num_events > 1 else 1
+    if num_events == 0:
+        # no event
+        data_matrix = np.empty((0, dur) + np.shape(data)[1:], dtype=data.dtype)
+    else:
+        # read-only view of all possible events (i.e. one event starting at each frame, time as second dimension)
+        windows = np.moveaxis(sliding_window_view(data, dur, axis=0), -1, 1)
+        if step > 0 and np.all(np.diff(onset) == step):
+            # evenly spaced onsets: strided view (no copy)
+            data_matrix = windows[onset[0]:onset[0]+step*(num_events-1)+1:step]
+        else:
+            # single vectorized gather
+            data_matrix = windows[onset]
     # Plotting
     if plotting == 1:
-        plt.imshow(data_matrix)
+        plt.imshow(np.reshape(data_matrix, (num_events, dur, -1))[:,:,0])
         plt.xlabel('Time [sec]')
         plt.ylabel('Event number')
         plt.title('All events')
         plt.show()
 
     return data_matrix
+
+def rep_events_stats(data_matrix):
+    '''
+    Calculates the average, standard deviation and median event across all events of a restructured matrix (e.g. output of average_rep_events).
+        Note: computed directly on data_matrix (no copy of the events when data_matrix is a view), frames filled with NaN are ignored.
+    Input:
+        data_matrix: mxdur array (or mxdurxk array for multiple channels) corresponding to the restructured matrix
+    Output:
+        mean_event: durx1 array (or durxk array) corresponding to the average event
+        std_event: durx1 array (or durxk array) corresponding to the standard deviation across events
+        median_event: durx1 array (or durxk array) corresponding to the median event
+    Dependencies:
+        None
+    '''
+    # NaN-aware statistics are only required for padded events
+    if np.issubdtype(data_matrix.dtype, np.floating) and np.isnan(data_matrix).any():
+        mean_event = np.nanmean(data_matrix, axis=0)
+        std_event = np.nanstd(data_matrix, axis=0)
+        median_event = np.nanmedian(data_matrix, axis=0)
+    else:
+        mean_event = np.mean(data_matrix, axis=0)
+        std_event = np.std(data_matrix, axis=0)
+        median_event = np.median(data_matrix, axis=0)
+
+    return mean_event, std_event, median_event
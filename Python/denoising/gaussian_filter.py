@@ -1,15 +1,20 @@
 # LIBRARIES IMPORT
 
 import numpy as np
+import scipy.fft
+import scipy.signal
 import matplotlib.pyplot as plt
 
+from kernel_cache import gaussian_kernel
+
 # FUNCTION
 
-def gaussian_filter(signal, mode=None, sampling_rate=None, fwhm=None, window=None, plotting=None):
+def gaussian_filter(signal, mode=None, sampling_rate=None, fwhm=None, window=None, plotting=None, axis=None, dtype=None, method=None, diagnostics=None, channel_chunk=None):
     '''
     Applies a Gaussian filter to a denoise time series.
+        Note: the weighted average is computed as a single convolution, either direct (short kernels) or FFT-based (long kernels), selected with a cost model.
     Input:
-        signal: nx1 array corresponding to the tested time series
+        signal: nx1 array corresponding to the tested time series, or nxm array corresponding to m channels (filtered along axis)
         mode: select mode to deal with edge effect
             0: set edges to zero
             1: set edges to original signal
@@ -22,56 +27,99 @@ def gaussian_filter(signal, mode=None, sampling_rate=None, fwhm=None, window=Non
             [default = 20]
         plotting: set to 1 if you wish to see the resulting filtered signal
             [default = 0]
+        axis: axis of signal corresponding to time (i.e. frames)
+            [default = 0]
+        dtype: floating point precision used for the computation and the output (np.float64 or np.float32)
+            [default = np.float64]
+        method: select convolution method
+            'auto': select the cheapest method based on the signal and kernel lengths [default]
+            'direct': direct convolution
+            'fft': single FFT convolution over the whole signal
+            'overlap-add': FFT convolution applied block by block (overlap-add)
+        diagnostics: dictionary updated with the selected method ('method') and the estimated cost of each method ('cost')
+            [default = None]
+        channel_chunk: number of channels filtered at once (limits memory for very wide arrays)
+            [default = all channels]
     Output:
-        filtered_signal: nx1 array corresponding to the filtered signal
+        filtered_signal: array with the same shape as signal corresponding to the filtered signal
         plot (optional): plots showing (1) the Gaussian with the corresponding full-width at half maximum, and (2) the original and filtered signals
     Dependencies:
-        None
+        kernel_cache (gaussian_kernel)
     '''
 
     # Deal with default values and potential missing input variables
     if mode == None:
         mode = 2
-    if sampling_rate == None:
-        sampling_rate = len(signal)
     if fwhm == None:
         fwhm = 25
     if window == None:
         window = 20
     if plotting == None:
         plotting = 0
+    if axis == None:
+        axis = 0
+    if dtype == None:
+        dtype = np.float64
+    if method == None:
+        method = 'auto'
 
-    # Define time based on signal length and sampling rate
-    time = np.arange(0,(len(signal))/sampling_rate,1/sampling_rate)
+    # Move time axis to the front (1D and multi-channel signals then share the same code)
+    data = np.moveaxis(np.asarray(signal, dtype=dtype), axis, 0)
 
     # Define number of frames
-    n = len(signal)
-
-    # Generate Gaussian kernel
-    #   normalized time vector in ms
-    gtime = 1000*np.arange(-window, window)/sampling_rate
-    #   generate Gaussian window
-    gauswin = np.exp(-(4*np.log(2)*gtime**2)/fwhm**2)
-    #   compute empirical full-width half-maximum
-    pstPeakHalf = window + np.argmin((gauswin[window:]-.5)**2)
-    prePeakHalf = np.argmin((gauswin-.5)**2)
-    empFWHM = gtime[pstPeakHalf] - gtime[prePeakHalf]
-    #   normalize Gaussian to unit energy
-    gauswinN = gauswin / np.sum(gauswin)
+    n = np.shape(data)[0]
+    if sampling_rate == None:
+        sampling_rate = n
+
+    # Define time based on signal length and sampling rate
+    time = np.arange(0, n)/sampling_rate
+
+    # Generate Gaussian kernel (or retrieve it from the kernel cache)
+    gtime, gauswin, prePeakHalf, pstPeakHalf, empFWHM, gauswinN = gaussian_kernel(sampling_rate, fwhm, window)
 
     # Initialize filtered signal
     if mode == 0:
-        filtered_signal = np.zeros(np.shape(signal))
+        filtered_signal = np.zeros(np.shape(data), dtype=dtype)
     elif mode == 1:
-        filtered_signal = signal
+        filtered_signal = np.array(data, order='C')
     elif mode == 2:
-        filtered_signal = np.empty(len(signal))
+        filtered_signal = np.empty(np.shape(data), dtype=dtype)
         filtered_signal[:] = np.nan
 
     # Apply Gaussian moving average filter with selected window
-    for i in range(window+1,n-window-1):
+    #   first and last filtered frames
+    start = window + 1
+    stop = n - window - 1
+    #   select convolution method
+    cost = _convolution_cost(n, len(gauswinN))
+    if method == 'auto':
+        method = min(cost, key=cost.get)
+    if method not in cost:
+        raise ValueError('Unknown convolution method: ' + str(method))
+    if stop > start:
         # each point is the weighted average of surrounding points (i.e. window length before and after)
-        filtered_signal[i] = np.sum(signal[i-window:i+window]*gauswinN)
+        #   all channels as columns (views of the data and filtered signal)
+        channels = np.reshape(data, (n, -1))
+        filtered_channels = np.reshape(filtered_signal, (n, -1))
+        if channel_chunk == None:
+            channel_chunk = max(np.shape(channels)[1], 1)
+        #   flipped kernel (convolution) shaped to broadcast along the channels
+        kernel = gauswinN[::-1].astype(dtype)[:,np.newaxis]
+        for i in range(0, np.shape(channels)[1], channel_chunk):
+            block = channels[:,i:i+channel_chunk]
+            #   valid convolution: weighted_sum[j] corresponds to the window starting at frame j
+            if method == 'direct':
+                weighted_sum = scipy.signal.convolve(block, kernel, mode='valid', method='direct')
+            elif method == 'fft':
+                weighted_sum = scipy.signal.fftconvolve(block, kernel, mode='valid', axes=0)
+            elif method == 'overlap-add':
+                weighted_sum = scipy.signal.oaconvolve(block, kernel, mode='valid', axes=0)
+            filtered_channels[start:stop,i:i+channel_chunk] = weighted_sum[start-window:stop-window]
+
+    # Report selected method
+    if diagnostics is not None:
+        diagnostics['method'] = method
+        diagnostics['cost'] = cost
 
     # Plotting
     if plotting == 1:
@@ -82,7 +130,7 @@ def gaussian_filter(signal, mode=None, sampling_rate=None, fwhm=None, window=Non
         plt.title('Gaussian kernel representation')
         plt.show()
         # plot original and filtered signals
-        plt.plot(time, signal, label='Original signal')
+        plt.plot(time, data, label='Original signal')
         plt.plot(time, filtered_signal, label='Gaussian-filtered')
         plt.xlabel('Time [sec]')
         plt.ylabel('Amplitude')
@@ -90,4 +138,29 @@ def gaussian_filter(signal, mode=None, sampling_rate=None, fwhm=None, window=Non
         plt.title('Gaussian smoothing filter')
         plt.show()
 
+    # Move time axis back to its original position
+    filtered_signal = np.moveaxis(filtered_signal, 0, axis)
+
     return filtered_signal
+
+def _convolution_cost(n, k):
+    '''
+    Estimates the number of operations required to convolve a time series with a kernel (per channel).
+    Input:
+        n: number of frames of the time series
+        k: number of frames of the kernel
+    Output:
+        cost: dictionary with the estimated cost of the 'direct', 'fft' and 'overlap-add' methods
+    '''
+    # Direct: one multiply-add per kernel sample and per output frame
+    direct = float(max(n-k+1, 1)*k)
+    # FFT: forward and inverse real transforms (~2.5*N*log2(N) flops each) of the signal padded to a fast length
+    nfft = scipy.fft.next_fast_len(n+k-1, real=True)
+    fft = float(5*nfft*np.log2(nfft))
+    # Overlap-add: same as FFT but on blocks of a few kernel lengths
+    block = scipy.fft.next_fast_len(min(8*k, n+k-1), real=True)
+    n_blocks = int(np.ceil(n/max(block-k+1, 1)))
+    overlap_add = float(5*n_blocks*block*np.log2(block))
+    cost = {'direct': direct, 'fft': fft, 'overlap-add': overlap_add}
+
+    return cost
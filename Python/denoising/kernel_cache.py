@@ -0,0 +1,99 @@
+# LIBRARIES IMPORT
+
+import numpy as np
+import functools
+
+# SETTINGS
+
+#   maximum number of kernels kept in memory (per kernel type), least recently used kernels are discarded first
+KERNEL_CACHE_SIZE = 128
+
+# FUNCTIONS
+
+@functools.lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def gaussian_kernel(sampling_rate, fwhm, window):
+    '''
+    Generates (or retrieves from cache) the Gaussian kernel used by gaussian_filter.
+        Note: returned arrays are shared between calls and therefore read-only.
+    Input:
+        sampling_rate: corresponding sampling rate of the time series (i.e. how many frames per seconds, in Hz)
+        fwhm: full-width at half maximum, key variable defining Gaussian filter
+        window: number of frames before and after each data point included in the kernel
+    Output:
+        gtime: (2*window,) array corresponding to the normalized time vector of the kernel (in ms)
+        gauswin: (2*window,) array corresponding to the Gaussian window
+        prePeakHalf: index of the half maximum located before the peak
+        pstPeakHalf: index of the half maximum located after the peak
+        empFWHM: empirical full-width at half maximum (in ms)
+        gauswinN: (2*window,) array corresponding to the Gaussian window normalized to unit energy
+    Dependencies:
+        None
+    '''
+    # Normalized time vector in ms
+    gtime = 1000*np.arange(-window, window)/sampling_rate
+    # Generate Gaussian window
+    gauswin = np.exp(-(4*np.log(2)*gtime**2)/fwhm**2)
+    # Compute empirical full-width half-maximum
+    pstPeakHalf = window + np.argmin((gauswin[window:]-.5)**2)
+    prePeakHalf = np.argmin((gauswin-.5)**2)
+    empFWHM = gtime[pstPeakHalf] - gtime[prePeakHalf]
+    # Normalize Gaussian to unit energy
+    gauswinN = gauswin / np.sum(gauswin)
+    # Protect cached arrays
+    for kernel in (gtime, gauswin, gauswinN):
+        kernel.flags.writeable = False
+
+    return gtime, gauswin, prePeakHalf, pstPeakHalf, empFWHM, gauswinN
+
+@functools.lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def moving_gaussian_kernel(mode, window):
+    '''
+    Generates (or retrieves from cache) the averaging mask used by moving_gaussian.
+        Note: returned array is shared between calls and therefore read-only.
+    Input:
+        mode: select type of moving average ('standard' or 'gaussian')
+        window: window size (standard mode) or sigma (gaussian mode)
+    Output:
+        avg_mask: array corresponding to the averaging mask
+    Dependencies:
+        None
+    '''
+    if mode == 'standard':
+        # Compute mask using standard method
+        avg_mask = np.ones(window) / window
+    else:
+        # Compute window using Gaussian method
+        gaussian_function = lambda x, sigma: 1/np.sqrt(2*np.pi*sigma**2) * np.exp(-(x**2)/(2*sigma**2))
+        gau_x = np.linspace(-2.7*window, 2.7*window, 6*window)
+        avg_mask = gaussian_function(gau_x, window)
+    # Protect cached array
+    avg_mask.flags.writeable = False
+
+    return avg_mask
+
+def kernel_cache_info():
+    '''
+    Reports the usage of the kernel cache shared by gaussian_filter and moving_gaussian.
+    Output:
+        info: dictionary with the number of cache hits ('hits') and misses ('misses'), the number of cached kernels ('size') and the maximum number of cached kernels ('maxsize')
+    Dependencies:
+        None
+    '''
+    info = {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 0}
+    for kernel_function in (gaussian_kernel, moving_gaussian_kernel):
+        cache_info = kernel_function.cache_info()
+        info['hits'] += cache_info.hits
+        info['misses'] += cache_info.misses
+        info['size'] += cache_info.currsize
+        info['maxsize'] += cache_info.maxsize
+
+    return info
+
+def clear_kernel_cache():
+    '''
+    Removes all cached kernels and resets the hit and miss counters.
+    Dependencies:
+        None
+    '''
+    gaussian_kernel.cache_clear()
+    moving_gaussian_kernel.cache_clear()
@@ -6,16 +6,21 @@ import matplotlib.pyplot as plt
 
 # FUNCTION
 
-def linear_detrend(signal, plotting=None):
+def linear_detrend(signal, plotting=None, axis=None, bp=None, chunk_size=None, out=None):
     '''
     Applies the detrend function to remove the linear trend from a time series.
         Note: added option to plot original and filtered signals.
+        Note: when chunk_size is set, the signal is read chunk by chunk (e.g. np.memmap, or any array-like supporting slicing) in two passes (line fit from running sums, then detrending), so memory only depends on chunk_size (if out is also provided, otherwise the full filtered signal is allocated in RAM).
     Input:
-        signal: nx1 array corresponding to the tested time series
+        signal: nx1 array corresponding to the tested time series, or nxm array corresponding to m channels (detrended along axis)
         plotting: set to 1 if you wish to see the resulting filtered signal
         [default = 0]
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
+        bp: list of frames defining breakpoints (a separate linear trend is removed between consecutive breakpoints) [default = None]
+        chunk_size: number of frames read at once (out-of-core mode) [default = None, i.e. whole signal at once]
+        out: array with the same shape as signal in which the filtered signal is written (e.g. np.memmap) [default = None, i.e. new array allocated in RAM]
     Output:
-        filtered_signal: nx1 array corresponding to the filtered time series
+        filtered_signal: array with the same shape as signal corresponding to the filtered time series
         plot (optional): plot showing the original and filtered signals
     Dependencies:
         None
@@ -24,16 +29,106 @@ def linear_detrend(signal, plotting=None):
     # Deal with default values and potential missing input variables
     if plotting == None:
         plotting = 0
+    if axis == None:
+        axis = 0
+    if bp is None:
+        bp = []
 
-    # Remove linear trend using detrend function
-    filtered_signal = scipy.signal.detrend(signal)
+    if chunk_size == None:
+        # Remove linear trend using detrend function
+        filtered_signal = scipy.signal.detrend(signal, axis=axis, bp=np.asarray(bp, dtype=int))
+        if out is not None:
+            out[...] = filtered_signal
+            filtered_signal = out
+    else:
+        # Remove linear trend chunk by chunk
+        if out is None:
+            out = np.empty(np.shape(signal))
+        _chunked_detrend(signal, out, axis, bp, chunk_size)
+        filtered_signal = out
 
     # Plotting
     if plotting == 1:
-        plt.plot(range(0,n), signal, label='Original (mean=%d' %np.nanmean(signal) + ')')
-        plt.plot(range(0,n), filtered_signal, label='Detrended (mean=%d' %np.nanmean(filtered_signal) + ')')
+        n = np.shape(signal)[axis]
+        plt.plot(range(0,n), np.moveaxis(signal, axis, 0), label='Original (mean=%d' %np.nanmean(signal) + ')')
+        plt.plot(range(0,n), np.moveaxis(filtered_signal, axis, 0), label='Detrended (mean=%d' %np.nanmean(filtered_signal) + ')')
         plt.xlabel('Time [sec]')
         plt.ylabel('Amplitude')
         plt.legend()
         plt.title('Linear detrending filter')
         plt.show()
+
+    return filtered_signal
+
+def _chunked_detrend(data, out, axis, bp, chunk_size):
+    '''
+    Removes the linear trend of each segment (between breakpoints) of a time series, reading and writing chunk_size frames at a time.
+    Input:
+        data: array (or array-like, e.g. np.memmap) only accessed through slices of the time axis
+        out: array (or array-like, e.g. np.memmap) in which the filtered signal is written
+        axis: axis of data corresponding to time (i.e. frames)
+        bp: list of frames defining breakpoints
+        chunk_size: number of frames read at once
+    '''
+    # Segment edges (same definition as scipy.signal.detrend)
+    axis = axis % len(np.shape(data))
+    n = np.shape(data)[axis]
+    edges = np.unique(np.concatenate(([0], np.asarray(bp, dtype=int), [n])))
+    edges = edges[(edges >= 0) & (edges <= n)]
+    n_seg = len(edges) - 1
+    channels = np.shape(data)[:axis] + np.shape(data)[axis+1:]
+
+    # Remove first frame to limit round-off errors in the running sums
+    offset = np.moveaxis(np.asarray(data[_time_slice(axis, 0, 1)], dtype=float), axis, 0)[0]
+
+    # First pass: running sums of t, t^2, y and t*y for each segment (t = frame number within the segment)
+    s0 = np.zeros(n_seg)
+    st = np.zeros(n_seg)
+    stt = np.zeros(n_seg)
+    sy = np.zeros((n_seg,) + channels)
+    sty = np.zeros((n_seg,) + channels)
+    for start, stop, seg, t, y in _chunk_segments(data, axis, edges, chunk_size, offset):
+        s0[seg] += stop - start
+        st[seg] += np.sum(t)
+        stt[seg] += np.sum(t**2)
+        sy[seg] += np.sum(y, axis=0)
+        sty[seg] += np.tensordot(t, y, axes=(0, 0))
+
+    # Least-squares line of each segment
+    expand = (slice(None),) + (np.newaxis,)*len(channels)
+    var = (stt - st**2/np.maximum(s0, 1))[expand]
+    cov = sty - (st/np.maximum(s0, 1))[expand]*sy
+    slope = np.divide(cov, var, out=np.zeros(np.shape(cov)), where=var>0)
+    intercept = sy/np.maximum(s0, 1)[expand] - slope*(st/np.maximum(s0, 1))[expand]
+
+    # Second pass: write detrended chunks
+    for start, stop, seg, t, y in _chunk_segments(data, axis, edges, chunk_size, offset):
+        out[_time_slice(axis, start, stop)] = np.moveaxis(y - (intercept[seg] + np.multiply.outer(t, slope[seg])), 0, axis)
+
+def _chunk_segments(data, axis, edges, chunk_size, offset):
+    '''
+    Reads a time series chunk by chunk and yields the portion of each chunk that belongs to each segment.
+    Output (generator):
+        start, stop: first and last (excluded) frames of the portion
+        seg: segment number
+        t: frame numbers of the portion within the segment
+        y: portion of the signal (minus offset), with time as first axis
+    '''
+    n = np.shape(data)[axis]
+    for chunk_start in range(0, n, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, n)
+        chunk = np.moveaxis(np.asarray(data[_time_slice(axis, chunk_start, chunk_stop)], dtype=float), axis, 0) - offset
+        # segments overlapping the chunk
+        first = np.searchsorted(edges, chunk_start, side='right') - 1
+        last = np.searchsorted(edges, chunk_stop, side='left')
+        for seg in range(first, last):
+            start = max(edges[seg], chunk_start)
+            stop = min(edges[seg+1], chunk_stop)
+            if stop > start:
+                yield start, stop, seg, np.arange(start, stop, dtype=float) - edges[seg], chunk[start-chunk_start:stop-chunk_start]
+
+def _time_slice(axis, start, stop):
+    '''
+    Returns the index selecting frames start to stop (excluded) along axis (i.e. data is only read through slicing).
+    '''
+    return (slice(None),)*axis + (slice(start, stop),)
@@ -4,35 +4,54 @@ import numpy as np
 
 # FUNCTION
 
-def lstm_filter(data, artifact):
+def lstm_filter(data, artifact, out=None):
     '''
     Applies a least-squares template-matching filter to remove a potential artifact from a data set.
         Note: works for 1D time series as well as multiple channels (e.g. original data set containing 10 channels of 10 distinct time series).
+        Note: the regression weights (intercept and slope) of all channels are computed at once from the channel means and covariances.
     Input:
         data: nxm array corresponding to the original data set
-        artifact: nxm array corresponding to the artifact data set
+        artifact: nxm array corresponding to the artifact data set, or nx1 array corresponding to a single artifact shared by all channels
+        out: nxm array in which the residual is written (e.g. preallocated buffer) [default = None]
     Output:
-        residual: nx1 array corresponding to the filtered data
+        residual: nxm array corresponding to the filtered data
     Dependencies:
         None
     '''
 
-    # Initialize residual
-    residual = np.zeros(np.shape(data))
-
-
-    for i in range(0,np.shape(data)[1]):
-
-        # Generate design matrix X
-        X = np.column_stack((np.ones(len(data)), artifact[:,i]))
+    # Reshape data and artifact into columns (1D time series are processed as a single channel)
+    data = np.asarray(data, dtype=float)
+    y = np.reshape(data, (np.shape(data)[0], -1))
+    x = np.reshape(np.asarray(artifact, dtype=float), (np.shape(data)[0], -1))
 
-        # Compute regression weights
-        b = np.linalg.solve(np.matrix.transpose(X)@X,np.matrix.transpose(X)@data[:,i])
-
-        # Compute predicted data (i.e. best fit to the artifact)
-        yHat = X@b
-
-        # Generate corresponding residuals (i.e. original data - artifact)
-        residual[:,i] = data[:,i] - yHat
-
-    return residual
+    # Initialize residual
+    if out is None:
+        out = np.empty(np.shape(data))
+    residual = np.reshape(out, np.shape(y))
+
+    # Compute regression weights
+    #   channel means
+    y_mean = np.mean(y, axis=0)
+    x_mean = np.mean(x, axis=0)
+    #   centered artifact (reused below to store the fitted artifact)
+    x_centered = x - x_mean
+    #   covariance between artifact and data, and variance of the artifact
+    if np.shape(x)[1] == 1:
+        cov = x_centered[:,0]@y
+    else:
+        cov = np.einsum('ij,ij->j', x_centered, y)
+    var = np.einsum('ij,ij->j', x_centered, x_centered)
+    #   slope (a constant artifact only removes the mean)
+    slope = np.divide(cov, var, out=np.zeros(np.shape(cov)), where=var>0)
+
+    # Compute predicted data (i.e. best fit to the artifact, intercept = y_mean - slope*x_mean)
+    yHat = np.multiply(x_centered, slope, out=x_centered if np.shape(x) == np.shape(y) else None)
+
+    # Generate corresponding residuals (i.e. original data - artifact)
+    np.subtract(y, yHat, out=residual)
+    residual -= y_mean
+    #   non-contiguous out (reshaped as a copy) -> write residual back into out
+    if not np.shares_memory(residual, out):
+        out[...] = np.reshape(residual, np.shape(out))
+
+    return out
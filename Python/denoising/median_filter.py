@@ -2,12 +2,13 @@
 
 import numpy as np
 import pylab
+from numpy.lib.stride_tricks import sliding_window_view
 import copy
 import matplotlib.pyplot as plt
 
 # FUNCTION
 
-def median_filter(signal, window=None, plotting=None):
+def median_filter(signal, window=None, plotting=None, threshold=None, threshold_param=None):
     '''
     Applies a Median filter to a denoise time series (especially to remove spikes).
         Note: for the manual threshold selection, look at the histogram and select a point located right from the largest concentration of points.
@@ -15,6 +16,14 @@ def median_filter(signal, window=None, plotting=None):
         signal: nx1 array corresponding to the tested time series
         window: number of frames used to define the size of the window (e.g. a value of 20 would mean that every data point in the original signal will be replaced with the median of the 20 data points before and the 20 data points after itself) [default = 20]
         plotting: set to 1 if you wish to see the resulting filtered signal [default = 0]
+        threshold: select how the spike threshold is defined (points above the threshold are replaced by the median)
+            'mad': median + threshold_param scaled median absolute deviations (non-interactive) [default]
+            'percentile': threshold_param-th percentile of the signal (non-interactive)
+            'histogram': valley located right from the largest concentration of points of a threshold_param-bins histogram (first empty bin, or lowest bin of the smoothed histogram) (non-interactive)
+            'manual': click on the histogram to select the threshold (requires a display)
+            'all': no threshold, every point is replaced by the median of its window (standard median filter)
+            number: threshold value used as is
+        threshold_param: parameter of the automatic threshold [default = 3 ('mad'), 99 ('percentile'), 100 ('histogram')]
     Output:
         filtered_signal: nx1 array corresponding to the filtered signal
         plot (optional): plot showing the original and filtered signals
@@ -27,30 +36,38 @@ def median_filter(signal, window=None, plotting=None):
         window = 20
     if plotting == None:
         plotting = 0
+    if threshold is None:
+        threshold = 'mad'
 
-    # Plot histogram to manually select filter threshold
-    fig = pylab.figure(1)
-    fig.canvas.set_window_title('Manual threshold selection')
-    fig.suptitle('Please select a frame located right from the largest concentration of points', fontsize=12)
-    ax = fig.add_subplot(111)
-    ax.hist(signal,100)
-    selection = np.array(plt.ginput(1))[0]
-    threshold = int(selection[0])
-    plt.close(fig)
+    # Define number of frames
+    n = len(signal)
 
-    # Find outliers using threshold
-    outliers = np.where(signal>threshold)[0]
+    # Define filter threshold
+    if threshold == 'manual':
+        # Plot histogram to manually select filter threshold
+        fig = pylab.figure(1)
+        fig.canvas.set_window_title('Manual threshold selection')
+        fig.suptitle('Please select a frame located right from the largest concentration of points', fontsize=12)
+        ax = fig.add_subplot(111)
+        ax.hist(signal,100)
+        selection = np.array(plt.ginput(1))[0]
+        threshold = int(selection[0])
+        plt.close(fig)
+    elif isinstance(threshold, str) and threshold != 'all':
+        # Compute threshold from the data
+        threshold = _auto_threshold(signal, threshold, threshold_param)
+
+    # Find outliers using threshold (every point when filtering the whole signal)
+    if isinstance(threshold, str) and threshold == 'all':
+        outliers = np.arange(0, n)
+    else:
+        outliers = np.where(signal>threshold)[0]
 
     # Initialize filtered signal
     filtered_signal = copy.deepcopy(signal)
 
-    # Loop through outliers and set to the median of the points in the corresponding window
-    for i in range(0, len(outliers)):
-        # find lower and upper bounds
-        low_bound = np.nanmax((0, outliers[i]-window))
-        upp_bound = np.nanmin((outliers[i]+window, len(signal)))
-        # compute median of surrounding points
-        filtered_signal[outliers[i]] = np.median(signal[low_bound:upp_bound])
+    # Set outliers to the median of the points in the corresponding window
+    filtered_signal[outliers] = _rolling_median(signal, window, outliers)
 
     # Plotting
     if plotting == 1:
@@ -63,3 +80,76 @@ def median_filter(signal, window=None, plotting=None):
         plt.show()
 
     return filtered_signal
+
+def _rolling_median(signal, window, indices, chunk_size=None):
+    '''
+    Computes the median of the points located within the window of each selected frame, in one vectorized pass.
+        Note: the window of frame i covers frames i-window to i+window-1 (truncated at the edges of the signal).
+    Input:
+        signal: nx1 array corresponding to the tested time series
+        window: number of frames before and after each selected frame
+        indices: array of frames for which the median is computed
+        chunk_size: number of windows gathered at once (limits memory to chunk_size*2*window values) [default = 2**20 // window]
+    Output:
+        medians: array with the median of each selected window
+    '''
+    if chunk_size == None:
+        chunk_size = max(2**20 // max(window, 1), 1)
+
+    # Signal properties
+    n = len(signal)
+    medians = np.empty(len(indices))
+
+    # Windows fully included in the signal: gather rows of a strided (zero-copy) window view
+    full = (indices >= window) & (indices + window <= n)
+    full_idx = np.where(full)[0]
+    if len(full_idx) > 0:
+        windows = sliding_window_view(signal, 2*window)
+        for i in range(0, len(full_idx), chunk_size):
+            chunk = full_idx[i:i+chunk_size]
+            medians[chunk] = np.median(windows[indices[chunk]-window], axis=1)
+
+    # Truncated windows located at the edges of the signal (at most 2*window frames)
+    for i in np.where(~full)[0]:
+        medians[i] = np.median(signal[max(0, indices[i]-window):min(indices[i]+window, n)])
+
+    return medians
+
+def _auto_threshold(signal, method, param=None):
+    '''
+    Computes a spike threshold from the distribution of a time series (non-interactive alternative to the manual selection).
+    Input:
+        signal: nx1 array corresponding to the tested time series
+        method: 'mad', 'percentile' or 'histogram' (see median_filter)
+        param: number of scaled median absolute deviations ('mad' - [default = 3]), percentile ('percentile' - [default = 99]) or number of bins ('histogram' - [default = 100])
+    Output:
+        threshold: threshold value
+    '''
+    if method == 'mad':
+        if param == None:
+            param = 3
+        # median absolute deviation, scaled to match the standard deviation of normally distributed data
+        median = np.nanmedian(signal)
+        mad = 1.4826*np.nanmedian(np.abs(signal - median))
+        threshold = median + param*mad
+    elif method == 'percentile':
+        if param == None:
+            param = 99
+        threshold = np.nanpercentile(signal, param)
+    elif method == 'histogram':
+        if param == None:
+            param = 100
+        counts, edges = np.histogram(signal[~np.isnan(signal)], bins=param)
+        # valley located right from the largest concentration of points: first empty bin (i.e. gap between signal and spikes),
+        # or lowest bin of the smoothed histogram (5-bin moving average, so that small fluctuations of the counts are ignored)
+        peak = np.argmax(counts)
+        empty = np.flatnonzero(counts[peak:] == 0)
+        if len(empty) > 0:
+            threshold = edges[peak + empty[0]]
+        else:
+            smoothed = np.convolve(counts, np.ones(5)/5, mode='same')
+            threshold = edges[peak + np.argmin(smoothed[peak:])]
+    else:
+        raise ValueError('Unknown threshold method: ' + str(method))
+
+    return threshold
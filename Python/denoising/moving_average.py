@@ -1,17 +1,16 @@
 # LIBRARIES IMPORT
 
 import numpy as np
-import copy
 import matplotlib.pyplot as plt
 
 # FUNCTION
 
-def moving_average(signal, mode=None, sampling_rate=None, window=None, plotting=None):
+def moving_average(signal, mode=None, sampling_rate=None, window=None, plotting=None, axis=None):
     '''
-    Applies a Median filter to a denoise time series (especially to remove spikes).
-        Note: for the manual threshold selection, look at the histogram and select a point located right from the largest concentration of points.
+    Applies a moving average filter to denoise a time series.
+        Note: the filter is computed with a running (cumulative) sum, so the cost is linear in the number of frames and independent of the window size.
     Input:
-        signal: nx1 array corresponding to the tested time series
+        signal: nx1 array corresponding to the tested time series, or nxm array corresponding to m channels (filtered along axis)
         mode: select mode to deal with edge effect
             0: set edges to zero
             1: set edges to original signal
@@ -19,8 +18,9 @@ def moving_average(signal, mode=None, sampling_rate=None, window=None, plotting=
         sampling_rate: corresponding sampling rate of the time series (i.e. how many frames per seconds, in Hz) [default = len(signal)]
         window: number of frames used to define the size of the window (e.g. a value of 20 would mean that every data point in the original signal will be replaced with the mean of the 20 data points before and the 20 data points after itself) [default = 20]
         plotting: set to 1 if you wish to see the resulting filtered signal [default = 0]
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
     Output:
-        filtered_signal: nx1 array corresponding to the filtered signal
+        filtered_signal: array with the same shape as signal corresponding to the filtered signal
         plot (optional): plot showing the original and filtered signals along with the corresponding window size
     Dependencies:
         None
@@ -29,43 +29,68 @@ def moving_average(signal, mode=None, sampling_rate=None, window=None, plotting=
     # Deal with default values and potential missing input variables
     if mode == None:
         mode = 2
-    if sampling_rate == None:
-        sampling_rate = len(signal)
     if window == None:
         window = 20
     if plotting == None:
         plotting = 0
+    if axis == None:
+        axis = 0
 
-    # Define time based on signal length and sampling rate
-    time = np.arange(0, (len(signal))/sampling_rate, 1/sampling_rate)
+    # Move time axis to the front (1D and multi-channel signals then share the same code)
+    data = np.moveaxis(np.asarray(signal, dtype=float), axis, 0)
 
     # Define number of frames
-    n = len(time)
+    n = np.shape(data)[0]
+    if sampling_rate == None:
+        sampling_rate = n
 
-    # Initialize filtered signal vector
+    # Initialize filtered signal
     if mode == 0:
-        filtered_signal = np.zeros(np.shape(signal))
+        filtered_signal = np.zeros(np.shape(data))
     elif mode == 1:
-        filtered_signal = copy.deepcopy(signal)
+        filtered_signal = data.copy()
     elif mode == 2:
-        filtered_signal = np.empty(len(signal))
+        filtered_signal = np.empty(np.shape(data))
         filtered_signal[:] = np.nan
 
     # Apply moving average filter with selected window
-    for i in range(window+1,n-window-1):
+    #   first and last filtered frames
+    start = window + 1
+    stop = n - window - 1
+    if stop > start:
+        #   NaNs are set to zero in the running sum and tracked separately to keep them local to their window
+        nan_logic = np.isnan(data)
+        has_nan = np.any(nan_logic)
+        if has_nan:
+            data = np.where(nan_logic, 0, data)
+        #   remove first frame before summing to limit round-off errors on long recordings
+        offset = data[0]
+        #   running sum with a leading zero (i.e. csum[k] = sum of the first k frames)
+        csum = np.zeros((n+1,) + np.shape(data)[1:])
+        np.cumsum(data - offset, axis=0, out=csum[1:])
         # each point is the average of surrounding points (within window)
-        filtered_signal[i] = np.mean(signal[i-window:i+window])
+        filtered_signal[start:stop] = (csum[start+window:stop+window] - csum[start-window:stop-window]) / (2*window) + offset
+        if has_nan:
+            nan_count = np.zeros((n+1,) + np.shape(data)[1:])
+            np.cumsum(nan_logic, axis=0, out=nan_count[1:])
+            window_nan = (nan_count[start+window:stop+window] - nan_count[start-window:stop-window]) > 0
+            filtered_signal[start:stop][window_nan] = np.nan
 
     # Plotting
     if plotting == 1:
+        # define time based on signal length and sampling rate
+        time = np.arange(0, n)/sampling_rate
         # compute window size in ms
         window_size = 1000*(window*2+1)/sampling_rate
         # plot the original and filtered signals
-        plt.plot(time, signal, label='Original')
+        plt.plot(time, np.moveaxis(np.asarray(signal), axis, 0), label='Original')
         plt.plot(time, filtered_signal, label='Moving average')
         plt.xlabel('Time [sec]')
         plt.ylabel('Amplitude')
         plt.title('Moving average filter with a window size of ' + str(int(window_size)) + '-ms')
         plt.show()
 
+    # Move time axis back to its original position
+    filtered_signal = np.moveaxis(filtered_signal, 0, axis)
+
     return filtered_signal
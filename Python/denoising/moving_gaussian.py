@@ -1,24 +1,31 @@
 # LIBRARIES IMPORT
 
 import numpy as np
+import scipy.signal
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 
+from kernel_cache import moving_gaussian_kernel
+
 # FUNCTION
 
-def moving_gaussian(signal, mode=None, window=None, plotting=None):
+def moving_gaussian(signal, mode=None, window=None, plotting=None, axis=None, channel_chunk=None):
     '''
     Applies a different moving average filter to a time series (standard and gaussian modes).
     Input:
-        signal: (n,) array: tested time series (e.g. x coordinates of a marker)
+        signal: (n,) array: tested time series (e.g. x coordinates of a marker), or (n,m) array corresponding to m channels (filtered along axis)
         mode: select type of moving average ('standard' or 'gaussian' - [default: gaussian])
         window: define the window size (standard mode) or sigma (gaussian mode)
             recommended window sizes: 3, 6, 10, 16, 22, 35 (the bigger the smoother - [default: 3])
             recommended sigma values: 1, 2, 3, 5, 8, 10 (the bigger the smoother - [default: 1])
         plotting: set to 1 if you wish to see the resulting filtered signal [default = 0]
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
+        channel_chunk: number of channels filtered at once (limits memory for very wide arrays) [default = all channels]
     Output:
-        filtered_signal: new (n,) array with filtered time series
+        filtered_signal: new array with the same shape as signal with filtered time series
         Note: filtered_signal may have less observations around the edge of the data
+    Dependencies:
+        kernel_cache (moving_gaussian_kernel)
     '''
     # Deal with default values and potential missing input variables
     if mode == None:
@@ -30,28 +37,33 @@ def moving_gaussian(signal, mode=None, window=None, plotting=None):
             window = 1
     if plotting == None:
         plotting = 0
+    if axis == None:
+        axis = 0
+
+    # Move time axis to the front and process all channels as columns
+    data = np.moveaxis(np.asarray(signal, dtype=float), axis, 0)
+    channels = np.reshape(data, (np.shape(data)[0], -1))
+    if channel_chunk == None:
+        channel_chunk = max(np.shape(channels)[1], 1)
 
-    if mode == 'standard':
-        # Compute mask using standard method
-        avg_mask = np.ones(window) / window
-    else:
-        # Compute window using Gaussian method
-        gaussian_function = lambda x, sigma: 1/np.sqrt(2*np.pi*sigma**2) * np.exp(-(x**2)/(2*sigma**2))
-        gau_x = np.linspace(-2.7*window, 2.7*window, 6*window)
-        avg_mask = gaussian_function(gau_x, window)
-    # Compute moving average
-    filtered_signal = np.convolve(signal, avg_mask, 'same')
+    # Compute averaging mask (or retrieve it from the kernel cache)
+    avg_mask = moving_gaussian_kernel(mode, window)
+    # Compute moving average (same mask applied to each block of channels)
+    filtered_signal = np.empty(np.shape(channels))
+    for i in range(0, np.shape(channels)[1], channel_chunk):
+        filtered_signal[:,i:i+channel_chunk] = scipy.signal.convolve(channels[:,i:i+channel_chunk], avg_mask[:,np.newaxis], 'same')
+    filtered_signal = np.moveaxis(np.reshape(filtered_signal, np.shape(data)), 0, axis)
 
     # Plotting
     if plotting == 1:
         # Define number of frames
-        x = np.arange(0,np.shape(signal)[0])
+        x = np.arange(0,np.shape(data)[0])
         # Create a figure canvas
         fig, ax = plt.subplots()
         # Plot the original, noisy data
-        ax.plot(x, signal, label='Original')
+        ax.plot(x, data, label='Original')
         # Plot the filtered signal
-        ax.plot(x, filtered_signal, label='Filtered', color='orange')
+        ax.plot(x, np.moveaxis(filtered_signal, axis, 0), label='Filtered', color='orange')
         # Add legend to plot
         ax.legend()
         plt.xlabel('Time [sec]')
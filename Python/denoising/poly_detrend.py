@@ -1,21 +1,21 @@
 # LIBRARIES IMPORT
 
 import numpy as np
-import scipy.signal
 import matplotlib.pyplot as plt
 
-from scipy import *
-
 # FUNCTION
 
-def poly_detrend(signal, plotting=None):
+def poly_detrend(signal, plotting=None, orders=None, axis=None):
     '''
     Calculates the optimal Bayes information criterion (BIC), generate the corresponding polynomial fit (order = optimal BIC), and applies a polynomial detrend to denoise a time series.
+        Note: all orders are evaluated from a single QR decomposition of a Legendre basis (scaled time), which is shared by all channels.
     Input:
-        signal: nx1 array corresponding to the tested time series
+        signal: nx1 array corresponding to the tested time series, or nxm array corresponding to m channels (detrended along axis)
         plotting: set to 1 if you wish to see the resulting filtered signal [default = 0]
+        orders: range of tested polynomial orders (orders >= number of frames are ignored) [default = range(5,40)]
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
     Output:
-        filtered_signal: nx1 array corresponding to the filtered signal
+        filtered_signal: array with the same shape as signal corresponding to the filtered signal
         plot (optional): plot showing the corresponding BIC evolution and the original and filtered signals
     Dependencies:
         None
@@ -24,39 +24,57 @@ def poly_detrend(signal, plotting=None):
     # Deal with default values and potential missing input variables
     if plotting == None:
         plotting = 0
+    if orders is None:
+        orders = range(5,40)
+    if axis == None:
+        axis = 0
 
-    # Signal properties
-    n = len(signal)
-    t = range(0,n)
+    # Move time axis to the front and process all channels as columns
+    data = np.moveaxis(np.asarray(signal, dtype=float), axis, 0)
+    shape = np.shape(data)
+    y = np.reshape(data, (shape[0], -1))
 
-    # Range of orders
-    orders = range(5,40)
+    # Signal properties
+    n = shape[0]
+    t = np.arange(0,n)
+
+    # Range of orders (a polynomial of order p requires at least p+1 frames)
+    orders = np.asarray(orders)
+    orders = orders[orders < n]
+    if len(orders) == 0:
+        raise ValueError('Signal is too short for the tested polynomial orders (%d frames).' %n)
+
+    # Generate orthonormal polynomial basis
+    #   Legendre polynomials of scaled time (i.e. between -1 and 1) up to the highest tested order
+    x = 2*t/max(n-1, 1) - 1
+    V = np.polynomial.legendre.legvander(x, np.max(orders))
+    #   orthonormalize (the first p+1 columns of Q span all polynomials of order p)
+    Q, R = np.linalg.qr(V)
+
+    # Project signal onto the basis
+    coefs = Q.T@y
+    #   residual of the highest order fit
+    sum_se_max = np.sum((y - Q@coefs)**2, axis=0)
 
     # Calculate corresponding sum of squared errors
-    sum_se = np.zeros(len(orders))
-
-    # Loop through orders
-    for i in range(0,len(orders)):
-        # compute polynomial fitting time series
-        yHat = np.polyval(polyfit(t, signal, orders[i]),t)
-        # compute corresponding fit of model to data (sum of squared errors)
-        sum_se[i] = np.sum((yHat-signal)**2)/n
+    #   for order p, the error is the highest order error plus the energy of the coefficients above p
+    tail = np.cumsum((coefs**2)[::-1], axis=0)[::-1]
+    tail = np.vstack((tail[1:], np.zeros((1, np.shape(y)[1]))))
+    sum_se = (sum_se_max + tail[orders])/n
 
     # Calculate BIC
-    bic = n*np.log(sum_se) + orders*np.log(n)
+    bic = n*np.log(sum_se) + orders[:,np.newaxis]*np.log(n)
 
     # Calculate optimal BIC (i.e. lowest)
-    bestP = min(bic)
-    idx = np.argmin(bic)
-
-    # Calculate polynomial fit
-    poly_coefs = polyfit(t, signal, orders[idx])
+    idx = np.argmin(bic, axis=0)
+    bestP = bic[idx, np.arange(0, np.shape(y)[1])]
 
-    # Calculate estimated data based on coefficients
-    yHat = polyval(poly_coefs, t)
+    # Calculate estimated data based on the coefficients up to the optimal order of each channel
+    keep = np.arange(0, np.shape(Q)[1])[:,np.newaxis] <= orders[idx]
+    yHat = Q@(coefs*keep)
 
     # Calculate detrended filtered signal (i.e. residual)
-    filtered_signal = signal - yHat
+    filtered_signal = y - yHat
 
     # Plotting
     if plotting == 1:
@@ -67,13 +85,16 @@ def poly_detrend(signal, plotting=None):
         plt.title('Bayes information criterion evolution')
         plt.show()
 
-        plt.plot(t, signal, label='Original')
+        plt.plot(t, y, label='Original')
         plt.plot(t, yHat, label='Polynomial fit')
         plt.plot(t, filtered_signal, 'k', label='Filtered')
         plt.xlabel('Time [sec]')
         plt.ylabel('Amplitude')
         plt.legend()
-        plt.title('Polynomial fit and detrending for order = ' + str(orders[idx]))
+        plt.title('Polynomial fit and detrending for order = ' + ', '.join(str(order) for order in orders[idx]))
         plt.show()
 
+    # Restore original shape
+    filtered_signal = np.moveaxis(np.reshape(filtered_signal, shape), 0, axis)
+
     return filtered_signal
@@ -20,11 +20,13 @@ def tkeo_zscore(signal, time=None, plotting=None):
         plot (optional): plot showing the original and filtered signals along with the corresponding z-scores
     Dependencies:
         None
+    See also:
+        StreamingTKEO (same filtered signal and z-score computed chunk by chunk)
     '''
 
     # Deal with default values and potential missing input variables
-    if time == None:
-        time = np.arange(0:len(signal))
+    if time is None:
+        time = np.arange(0,len(signal))
     if plotting == None:
         plotting = 0
 
@@ -40,7 +42,7 @@ def tkeo_zscore(signal, time=None, plotting=None):
     #   convert original time series
     signal_zscore = (signal-np.mean(signal[0:time0])) / np.std(signal[0:time0])
     #  convert filtered time series
-    filtered_signal_zscore = (filtered_signal-np.mean(filtered_signal[0:time0])) / std(filtered_signal[0:time0])
+    filtered_signal_zscore = (filtered_signal-np.mean(filtered_signal[0:time0])) / np.std(filtered_signal[0:time0])
 
     # Plotting
     if plotting == 1:
@@ -63,3 +65,103 @@ def tkeo_zscore(signal, time=None, plotting=None):
         plt.show()
 
     return filtered_signal, signal_zscore, filtered_signal_zscore
+
+# CLASS
+
+class StreamingTKEO:
+    '''
+    Applies a Teager-Kaiser Energy-tracking Operator (TKEO) to a time series acquired chunk by chunk (e.g. live Electromyogram) and generates the corresponding Z-Scores relative to a baseline (i.e. first frames of the time series).
+        Note: the concatenated outputs are equal to filtered_signal and filtered_signal_zscore of tkeo_zscore (with time0 = baseline_length), up to round-off errors.
+        Note: memory does not depend on the duration of the recording (only the last two frames and, until the baseline is complete, the baseline energies are kept).
+    Input:
+        baseline_length: number of frames used to compute the baseline mean and standard deviation (i.e. pre-stimulus frames)
+    Methods:
+        process(chunk): adds a new chunk (kx1 array, or kxm array for m channels) and returns the energy and energy z-score of all frames that can be computed (i.e. one frame of latency, and no output until the baseline is complete)
+        finish(): returns the energy and energy z-score of the remaining frames (i.e. last frame, and baseline frames if the baseline is incomplete)
+        reset(): clears the history and the baseline statistics
+    Output (process and finish):
+        filtered_chunk: array corresponding to the filtered signal (TKEO) of the returned frames
+        filtered_chunk_zscore: array corresponding to z-score of the filtered signal of the returned frames
+    Dependencies:
+        None
+    '''
+
+    def __init__(self, baseline_length):
+        self.baseline_length = baseline_length
+        self.reset()
+
+    def reset(self):
+        # Last two frames of the signal (the last one is not filtered yet)
+        self._tail = None
+        # Number of frames received
+        self.n_frames = 0
+        # Baseline running statistics (number of frames, mean and sum of squared differences)
+        self._count = 0
+        self._mean = 0.
+        self._m2 = 0.
+        # Energies waiting for the baseline to be complete
+        self._pending = []
+
+    def process(self, chunk):
+        chunk = np.asarray(chunk, dtype=float)
+        if np.shape(chunk)[0] == 0:
+            return self._empty(chunk), self._empty(chunk)
+        # Concatenate with the last two frames of the previous chunk
+        if self._tail is None:
+            buf = chunk
+        else:
+            buf = np.concatenate((self._tail, chunk))
+        # Apply TKEO to all frames with a known neighbor on each side (first frame of the signal is kept as is)
+        filtered_chunk = buf[1:-1]**2 - buf[0:-2]*buf[2:]
+        if self.n_frames == 0:
+            filtered_chunk = np.concatenate((buf[0:1], filtered_chunk))
+        # Update history
+        self._tail = buf[-2:]
+        self.n_frames += np.shape(chunk)[0]
+
+        return self._zscore(filtered_chunk)
+
+    def finish(self):
+        # Last frame of the signal is kept as is
+        if self.n_frames > 1:
+            filtered_chunk = self._tail[-1:]
+        else:
+            filtered_chunk = self._empty(self._tail)
+        self._tail = None
+        # Z-score all remaining frames (with an incomplete baseline if the signal is shorter than the baseline)
+        if len(self._pending) > 0:
+            filtered_chunk = np.concatenate(self._pending + [filtered_chunk])
+            self._pending = []
+        if self._count < self.baseline_length:
+            base = filtered_chunk[0:self.baseline_length]
+            self._count, self._mean, self._m2 = np.shape(base)[0], np.mean(base, axis=0), np.sum((base-np.mean(base, axis=0))**2, axis=0)
+        filtered_chunk_zscore = (filtered_chunk-self._mean) / np.sqrt(self._m2/self._count)
+
+        return filtered_chunk, filtered_chunk_zscore
+
+    def _zscore(self, filtered_chunk):
+        # Update baseline statistics (Welford/Chan update with the frames that belong to the baseline)
+        n_base = min(self.baseline_length - self._count, np.shape(filtered_chunk)[0])
+        if n_base > 0:
+            base = filtered_chunk[0:n_base]
+            base_mean = np.mean(base, axis=0)
+            delta = base_mean - self._mean
+            total = self._count + n_base
+            self._m2 = self._m2 + np.sum((base-base_mean)**2, axis=0) + delta**2*self._count*n_base/total
+            self._mean = self._mean + delta*n_base/total
+            self._count = total
+        # Wait for the baseline to be complete
+        if self._count < self.baseline_length:
+            self._pending.append(filtered_chunk)
+            return self._empty(filtered_chunk), self._empty(filtered_chunk)
+        # Release energies kept while the baseline was incomplete
+        if len(self._pending) > 0:
+            filtered_chunk = np.concatenate(self._pending + [filtered_chunk])
+            self._pending = []
+        # Convert filtered time series to z-score
+        filtered_chunk_zscore = (filtered_chunk-self._mean) / np.sqrt(self._m2/self._count)
+
+        return filtered_chunk, filtered_chunk_zscore
+
+    def _empty(self, like):
+        return np.empty((0,) + np.shape(like)[1:])
@@ -2,89 +2,131 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-import scipy
+import scipy as sp
+import scipy.fftpack
+import functools
 
-from scipy import signal
+from scipy.signal import firls
+from scipy.signal import filtfilt
+from scipy.signal import lfilter
+from scipy.signal import oaconvolve
+from scipy.signal import sosfilt
+from scipy.signal import sosfiltfilt
+from scipy.signal import sosfreqz
+from scipy.signal import butter
+from scipy.signal import cheby1
+from scipy.signal import cheby2
+from scipy.signal import group_delay
 
 # FUNCTION
 
-def firls_filter(signal, mode=None, sampling_rate=None, cutoff_f=None, order=None, plotting=None):
+def firls_filter(signal, mode=None, sampling_rate=None, cutoff_f=None, order=None, plotting=None, kernel=None, method=None, axis=None, frex=None, shape=None, filter_type=None, channel_chunk=None):
     '''
     Applies a Finite Impulse Response (FIR) least-square filter to a time series.
         Note: uses firls function.
+        Note: the kernel is designed with design_firls_kernel (cached), or can be designed once and passed with kernel.
+        Note: the filter is applied forward and backward (zero-phase), either in direct form (filtfilt) or with FFT overlap-add convolutions (fft_filtfilt, faster for long kernels).
+        Note: an IIR filter (second-order sections, see design_iir_kernel) can be used instead of the FIR kernel with filter_type (fewer operations for sharp and low cut-off frequencies, see FilterKernel.flops_per_sample).
     Input:
-        signal: nx1 array corresponding to the tested time series
+        signal: nx1 array corresponding to the tested time series, or nxm array corresponding to m channels (filtered along axis)
         mode: select type of filter
             0: low-pass filter (gets ride of high frequencies) [default]
             1: high-pass filter (gets ride of low frequencies)
+            2: band-pass filter (keeps frequencies between cutoff_f[0] and cutoff_f[1])
+            3: band-stop filter (gets ride of frequencies between cutoff_f[0] and cutoff_f[1], e.g. notch filter)
+            4: multi-band filter (arbitrary shape defined by frex and shape, FIR only)
         sampling_rate: corresponding sampling rate of the time series (i.e. how many frames per seconds, in Hz) [default = length(signal)]
-        cutoff_f: cut-off frequency (frequencies above this value will be filtered) [default (arbitrary) = 30]
+        cutoff_f: cut-off frequency (frequencies above this value will be filtered), or [low, high] cut-off frequencies (mode 2 and 3) [default (arbitrary) = 30, or [30, 60]]
         order: define order of the Kernel (higher order will have more time
             points and bring the Actual Kernel closer to the Ideal Kernel, but too high values will also add artifacts)
-                [default = 5]
-        shape: define shape of the filter Kernel (in frequency space) [default: [1 1 0 0]]
+                [default = 5 (FIR), 4 (IIR)]
         plotting: set to 1 if you wish to see the resulting Kernel and filtered signal [default = 0]
+        kernel: FilterKernel returned by design_firls_kernel or design_iir_kernel (mode, sampling_rate, cutoff_f, order, frex, shape and filter_type are then ignored) [default = None]
+        method: select how the kernel is applied
+            'auto': 'fft' for kernels longer than 200 coefficients, 'direct' otherwise [default]
+            'direct': direct-form forward-backward filtering (filtfilt)
+            'fft': FFT overlap-add forward-backward filtering (fft_filtfilt)
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
+        frex: frequencies defining the ideal kernel, by pairs of band edges (mode 4 only, e.g. [0, 8, 10, 20, 22, nyquist])
+        shape: define shape of the filter Kernel (in frequency space) at each frequency of frex (mode 4 only, e.g. [0, 0, 1, 1, 0, 0])
+        filter_type: select filter design
+            'fir': least-square FIR kernel (design_firls_kernel) [default]
+            'butter', 'cheby1' or 'cheby2': IIR filter of the corresponding family (design_iir_kernel)
+        channel_chunk: number of channels filtered at once (limits memory for very wide arrays) [default = all channels]
     Output:
-        filtered_signal: nx1 array corresponding to the filtered signal
+        filtered_signal: array with the same shape as signal corresponding to the filtered signal
         plot (optional): plots showing (1) the Kernel (in time and frequency domains), and (2) the original and filtered signals (in time and frequency domains)
     Dependencies:
         None
     '''
 
     # Deal with default values and potential missing input variables
-    if mode == None:
-        mode = 0
-    if sampling_rate == None:
-        sampling_rate = len(signal)
-    if cutoff_f == None:
-        cutoff_f = 30
-    if order == None:
-        order = 5
     if plotting == None:
         plotting = 0
+    if method == None:
+        method = 'auto'
+    if axis == None:
+        axis = 0
+    if filter_type == None:
+        filter_type = 'fir'
 
-    # Define time based on signal length and sampling rate
-    time = np.arange(0,(len(signal))/sampling_rate,1/sampling_rate)
-
-    # Define additional kernel parameters
-    if mode == 0:
-        shape = [1, 1, 0, 0]
-    elif mode == 1:
-        shape = [0, 0, 1, 1]
-    nyquist = sampling_rate/2
-    num_points = len(time)
-    transw = .1
-    order = np.round(order*sampling_rate/cutoff_f)+1
-    # order must be odd
-    if order%2==0:
-        order += 1
-    frex = [0, cutoff_f, cutoff_f+cutoff_f*transw, nyquist]
-
-    # Build kernel
-    filter_kernel = firls(order, frex, shape, fs=sampling_rate)
-
-    # Compute the power spectrum of the signal and filter kernel
-    filter_power = np.abs(sp.fftpack.fft(filter_kernel,num_points))**2
-
-    # Compute the frequency vector and remove negative frequencies
-    hz = np.linspace(0, sampling_rate/2, int(np.floor(num_points/2)+1))
-    filter_power = filter_power[0:len(hz)]
+    # Build kernel (or retrieve it from the kernel cache)
+    if kernel is None:
+        if sampling_rate == None:
+            sampling_rate = np.shape(signal)[axis]
+        if filter_type == 'fir':
+            kernel = design_firls_kernel(mode=mode, sampling_rate=sampling_rate, cutoff_f=cutoff_f, order=order, frex=frex, shape=shape)
+        else:
+            kernel = design_iir_kernel(mode=mode, sampling_rate=sampling_rate, cutoff_f=cutoff_f, order=order, family=filter_type)
 
     # Apply filter to the data
-    filtered_signal = filtfilt(filter_kernel, 1, signal)
+    #   direct form is faster for short kernels, FFT for long kernels
+    if method == 'auto':
+        method = 'fft' if kernel.coefs is not None and len(kernel.coefs) > 200 else 'direct'
+    if method not in ('direct', 'fft'):
+        raise ValueError('Unknown filtering method: ' + str(method))
+    #   all channels as columns, filtered by blocks of channel_chunk channels
+    data = np.moveaxis(np.asarray(signal, dtype=float), axis, 0)
+    channels = np.reshape(data, (np.shape(data)[0], -1))
+    if channel_chunk == None:
+        channel_chunk = max(np.shape(channels)[1], 1)
+    filtered_signal = np.empty(np.shape(channels))
+    for i in range(0, np.shape(channels)[1], channel_chunk):
+        block = channels[:,i:i+channel_chunk]
+        if kernel.sos is not None:
+            filtered_signal[:,i:i+channel_chunk] = sosfiltfilt(kernel.sos, block, axis=0)
+        elif method == 'direct':
+            filtered_signal[:,i:i+channel_chunk] = filtfilt(kernel.coefs, 1, block, axis=0)
+        else:
+            filtered_signal[:,i:i+channel_chunk] = fft_filtfilt(kernel.coefs, block, axis=0)
+    filtered_signal = np.moveaxis(np.reshape(filtered_signal, np.shape(data)), 0, axis)
 
     # Plotting
     if plotting == 1:
-        # plot Kernel (time domain)
+        sampling_rate = kernel.sampling_rate
+        # define time based on signal length and sampling rate
+        signal = np.moveaxis(signal, axis, 0)
+        filtered_signal = np.moveaxis(filtered_signal, axis, 0)
+        num_points = len(signal)
+        time = np.arange(0, num_points)/sampling_rate
+        # compute the power spectrum of the filter kernel
+        hz, filter_power = kernel.power_spectrum(num_points)
+        # plot Kernel (time domain - impulse response for IIR filters)
         plt.subplot(121)
-        plt.plot(np.arange(-order/2,order/2)/sampling_rate, filter_kernel, 'k')
+        if kernel.sos is not None:
+            impulse = np.zeros(int(sampling_rate))
+            impulse[0] = 1
+            plt.plot(np.arange(0,len(impulse))/sampling_rate, sosfilt(kernel.sos, impulse), 'k')
+        else:
+            plt.plot(np.arange(-kernel.order/2,kernel.order/2)/sampling_rate, kernel.coefs, 'k')
         plt.xlabel('Time [sec]')
         plt.title('Filter Kernel (time domain)')
         # plot Kernel (frequency domain - power spectrum)
         plt.subplot(122)
-        plt.plot(np.array(frex), shape, 'r')
-        plt.plot(hz, filter_power[:len(hz)], 'k')
-        plt.xlim([0, 2*cutoff_f])
+        if kernel.frex is not None:
+            plt.plot(np.array(kernel.frex), kernel.shape, 'r')
+        plt.plot(hz, filter_power, 'k')
+        plt.xlim([0, 2*np.max(kernel.cutoff_f)])
         plt.xlabel('Frequency [Hz]')
         plt.ylabel('Gain')
         plt.title('Filter Kernel (frequency domain - power spectrum)')
@@ -98,8 +140,8 @@ def firls_filter(signal, mode=None, sampling_rate=None, cutoff_f=None, order=Non
         plt.ylabel('Amplitude')
         plt.title('Original vs. Filtered signals (time domain)')
         # plot original and filtered signals (frequency domain - power spectra)
-        yOrigX = np.abs(sp.fftpack.fft(signal)/num_points)**2
-        yFiltX = np.abs(sp.fftpack.fft(filtered_signal)/num_points)**2
+        yOrigX = np.abs(sp.fftpack.fft(signal, axis=0)/num_points)**2
+        yFiltX = np.abs(sp.fftpack.fft(filtered_signal, axis=0)/num_points)**2
         plt.subplot(212)
         plt.plot(hz, yOrigX[:len(hz)], label='Original')
         plt.plot(hz, yFiltX[:len(hz)], label='Filtered')
@@ -110,3 +152,308 @@ def firls_filter(signal, mode=None, sampling_rate=None, cutoff_f=None, order=Non
         plt.ylabel('Power [log]')
         plt.title('Original vs. Filtered signals (frequency domain - power spectra)')
         plt.show()
+        filtered_signal = np.moveaxis(filtered_signal, 0, axis)
+
+    return filtered_signal
+
+def fft_filtfilt(coefs, signal, axis=None):
+    '''
+    Applies a FIR kernel forward and backward (zero-phase) to a time series using FFT overlap-add convolutions.
+        Note: same edge handling as filtfilt(coefs, 1, signal) (odd extension of 3*len(coefs) frames and steady-state initial conditions), so both outputs are equal up to round-off errors.
+        Note: the block size of the overlap-add convolution is selected automatically based on the signal and kernel lengths (see scipy.signal.oaconvolve).
+    Input:
+        coefs: kernel coefficients
+        signal: nx1 array corresponding to the tested time series, or nxm array corresponding to m channels (filtered along axis)
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
+    Output:
+        filtered_signal: array with the same shape as signal corresponding to the filtered signal
+    Dependencies:
+        None
+    '''
+
+    # Deal with default values and potential missing input variables
+    if axis == None:
+        axis = 0
+
+    # Move time axis to the front (all channels are filtered at once)
+    data = np.moveaxis(np.asarray(signal, dtype=float), axis, 0)
+    num_taps = len(coefs)
+    padlen = 3*num_taps
+    if np.shape(data)[0] <= padlen:
+        raise ValueError('The length of the signal must be greater than ' + str(padlen) + ' frames (3*len(coefs)).')
+
+    # Extend signal with a point-symmetric reflection of each edge (odd extension)
+    ext = np.concatenate((2*data[0:1] - data[padlen:0:-1], data, 2*data[-1:] - data[-2:-padlen-2:-1]))
+
+    # Kernel shaped to broadcast along the channels
+    kernel = np.reshape(coefs, (-1,) + (1,)*(data.ndim-1))
+
+    # Causal filtering with steady-state initial conditions (i.e. signal extended with its first value)
+    def causal_filter(x):
+        x = np.concatenate((np.repeat(x[0:1], num_taps-1, axis=0), x))
+        return oaconvolve(x, kernel, mode='valid', axes=0)
+
+    # Apply filter forward then backward, and remove extension
+    filtered_signal = causal_filter(ext)
+    filtered_signal = causal_filter(filtered_signal[::-1])[::-1]
+    filtered_signal = filtered_signal[padlen:-padlen]
+
+    # Move time axis back to its original position
+    filtered_signal = np.moveaxis(filtered_signal, 0, axis)
+
+    return filtered_signal
+
+def design_firls_kernel(mode=None, sampling_rate=None, cutoff_f=None, order=None, frex=None, shape=None):
+    '''
+    Designs (or retrieves from cache) the least-square FIR kernel used by firls_filter.
+        Note: kernels are cached based on the design parameters (see firls_kernel_cache_info() and clear_firls_kernel_cache()).
+    Input:
+        mode: select type of filter
+            0: low-pass filter (gets ride of high frequencies) [default]
+            1: high-pass filter (gets ride of low frequencies)
+            2: band-pass filter (keeps frequencies between cutoff_f[0] and cutoff_f[1])
+            3: band-stop filter (gets ride of frequencies between cutoff_f[0] and cutoff_f[1], e.g. notch filter)
+            4: multi-band filter (arbitrary shape defined by frex and shape)
+        sampling_rate: corresponding sampling rate of the time series (i.e. how many frames per seconds, in Hz)
+        cutoff_f: cut-off frequency (mode 0 and 1), or [low, high] cut-off frequencies (mode 2 and 3) [default (arbitrary) = 30, or [30, 60]]
+        order: define order of the Kernel (scaled by sampling_rate/lowest cut-off frequency) [default = 5]
+        frex: frequencies defining the ideal kernel, by pairs of band edges (mode 4 only, e.g. [0, 8, 10, 20, 22, nyquist])
+        shape: gain of the ideal kernel at each frequency of frex (mode 4 only, e.g. [0, 0, 1, 1, 0, 0])
+    Output:
+        kernel: FilterKernel (read-only, picklable) containing the kernel coefficients and design parameters
+    Dependencies:
+        None
+    '''
+
+    # Deal with default values and potential missing input variables (tuples are used as cache keys)
+    if mode == None:
+        mode = 0
+    if cutoff_f is None:
+        cutoff_f = 30 if mode in (0, 1) else (30, 60)
+    if order == None:
+        order = 5
+    cutoff_f = tuple(cutoff_f) if np.ndim(cutoff_f) > 0 else cutoff_f
+    frex = tuple(frex) if frex is not None else None
+    shape = tuple(shape) if shape is not None else None
+
+    return _cached_firls_kernel(mode, sampling_rate, cutoff_f, order, frex, shape)
+
+@functools.lru_cache(maxsize=128)
+def _cached_firls_kernel(mode, sampling_rate, cutoff_f, order, frex, shape):
+    # Define additional kernel parameters
+    nyquist = sampling_rate/2
+    transw = .1
+    if mode == 0:
+        shape = (1, 1, 0, 0)
+        frex = (0, cutoff_f, cutoff_f+cutoff_f*transw, nyquist)
+    elif mode == 1:
+        shape = (0, 0, 1, 1)
+        frex = (0, cutoff_f, cutoff_f+cutoff_f*transw, nyquist)
+    elif mode == 2:
+        shape = (0, 0, 1, 1, 0, 0)
+        frex = (0, cutoff_f[0]-cutoff_f[0]*transw, cutoff_f[0], cutoff_f[1], cutoff_f[1]+cutoff_f[1]*transw, nyquist)
+    elif mode == 3:
+        shape = (1, 1, 0, 0, 1, 1)
+        frex = (0, cutoff_f[0]-cutoff_f[0]*transw, cutoff_f[0], cutoff_f[1], cutoff_f[1]+cutoff_f[1]*transw, nyquist)
+    elif mode == 4:
+        if frex is None or shape is None:
+            raise ValueError('frex and shape must be defined for multi-band filters (mode 4).')
+    else:
+        raise ValueError('Unknown filter mode: ' + str(mode))
+    #   kernel length is scaled by the lowest (non-zero) band edge, i.e. the narrowest transition
+    lowest_f = min(f for f in frex if f > 0) if mode == 4 else np.min(cutoff_f)
+    order = int(np.round(order*sampling_rate/lowest_f)+1)
+    # order must be odd
+    if order%2==0:
+        order += 1
+
+    # Build kernel
+    filter_kernel = firls(order, frex, shape, fs=sampling_rate)
+
+    return FilterKernel(filter_kernel, None, sampling_rate, cutoff_f, order, frex, shape)
+
+def firls_kernel_cache_info():
+    '''
+    Reports the usage of the FIR kernel cache.
+    Output:
+        info: dictionary with the number of cache hits ('hits') and misses ('misses'), the number of cached kernels ('size') and the maximum number of cached kernels ('maxsize')
+    '''
+    cache_info = _cached_firls_kernel.cache_info()
+
+    return {'hits': cache_info.hits, 'misses': cache_info.misses, 'size': cache_info.currsize, 'maxsize': cache_info.maxsize}
+
+def clear_firls_kernel_cache():
+    '''
+    Removes all cached FIR kernels and resets the hit and miss counters.
+    '''
+    _cached_firls_kernel.cache_clear()
+
+def design_iir_kernel(mode=None, sampling_rate=None, cutoff_f=None, order=None, family=None, ripple=None):
+    '''
+    Designs an Infinite Impulse Response (IIR) filter as second-order sections (SOS), an alternative to the FIR kernel requiring fewer operations for sharp and low cut-off frequencies.
+    Input:
+        mode: select type of filter
+            0: low-pass filter (gets ride of high frequencies) [default]
+            1: high-pass filter (gets ride of low frequencies)
+            2: band-pass filter (keeps frequencies between cutoff_f[0] and cutoff_f[1])
+            3: band-stop filter (gets ride of frequencies between cutoff_f[0] and cutoff_f[1], e.g. notch filter)
+        sampling_rate: corresponding sampling rate of the time series (i.e. how many frames per seconds, in Hz)
+        cutoff_f: cut-off frequency (mode 0 and 1), or [low, high] cut-off frequencies (mode 2 and 3) [default (arbitrary) = 30, or [30, 60]]
+        order: order of the IIR filter (doubled for band filters) [default = 4]
+        family: select filter family
+            'butter': Butterworth (maximally flat pass band) [default]
+            'cheby1': Chebyshev type I (ripple in the pass band, sharper transition)
+            'cheby2': Chebyshev type II (ripple in the stop band, sharper transition, cutoff_f then defines the start of the stop band)
+        ripple: maximum ripple in the pass band (cheby1, in dB) or minimum attenuation in the stop band (cheby2, in dB) [default = 1 (cheby1), 40 (cheby2)]
+    Output:
+        kernel: FilterKernel (picklable) containing the second-order sections and design parameters
+    Dependencies:
+        None
+    '''
+
+    # Deal with default values and potential missing input variables
+    if mode == None:
+        mode = 0
+    if cutoff_f is None:
+        cutoff_f = 30 if mode in (0, 1) else (30, 60)
+    if order == None:
+        order = 4
+    if family == None:
+        family = 'butter'
+    cutoff_f = tuple(cutoff_f) if np.ndim(cutoff_f) > 0 else cutoff_f
+
+    # Define filter type
+    if mode not in (0, 1, 2, 3):
+        raise ValueError('Unknown filter mode for IIR filters: ' + str(mode))
+    btype = ('lowpass', 'highpass', 'bandpass', 'bandstop')[mode]
+
+    # Build second-order sections
+    if family == 'butter':
+        sos = butter(order, cutoff_f, btype=btype, output='sos', fs=sampling_rate)
+    elif family == 'cheby1':
+        sos = cheby1(order, 1 if ripple == None else ripple, cutoff_f, btype=btype, output='sos', fs=sampling_rate)
+    elif family == 'cheby2':
+        sos = cheby2(order, 40 if ripple == None else ripple, cutoff_f, btype=btype, output='sos', fs=sampling_rate)
+    else:
+        raise ValueError('Unknown IIR filter family: ' + str(family))
+
+    return FilterKernel(None, sos, sampling_rate, cutoff_f, order, None, None)
+
+# CLASS
+
+class FilterKernel:
+    '''
+    Filter kernel designed once and reused across calls (e.g. sent once to each worker process).
+    Attributes:
+        coefs: FIR kernel coefficients (read-only array, None for IIR filters)
+        sos: IIR second-order sections (None for FIR filters)
+        sampling_rate: sampling rate used for the design (in Hz)
+        cutoff_f: cut-off frequency or frequencies (in Hz)
+        order: number of kernel coefficients (FIR) or filter order (IIR)
+        frex: frequencies defining the ideal kernel (in Hz, FIR only)
+        shape: gain of the ideal kernel at each frequency of frex (FIR only)
+        flops_per_sample: number of floating point operations per frame and per channel for forward-backward filtering in direct form (FIR: 2 passes of len(coefs) multiply-adds, IIR: 2 passes of 9 operations per second-order section)
+    Methods:
+        power_spectrum(num_points): returns the frequency vector (hz) and power spectrum (filter_power) of the kernel computed on num_points
+    '''
+
+    def __init__(self, coefs, sos, sampling_rate, cutoff_f, order, frex, shape):
+        self.coefs = None if coefs is None else np.array(coefs, dtype=float)
+        self.sos = None if sos is None else np.array(sos, dtype=float)
+        self.sampling_rate = sampling_rate
+        self.cutoff_f = cutoff_f
+        self.order = order
+        self.frex = frex
+        self.shape = shape
+        self._protect()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._protect()
+
+    def _protect(self):
+        if self.coefs is not None:
+            self.coefs.flags.writeable = False
+
+    @property
+    def flops_per_sample(self):
+        if self.sos is not None:
+            return 2*9*len(self.sos)
+        return 2*2*len(self.coefs)
+
+    def power_spectrum(self, num_points):
+        # Compute the frequency vector (positive frequencies only)
+        hz = np.linspace(0, self.sampling_rate/2, int(np.floor(num_points/2)+1))
+        # Compute the power spectrum of the filter kernel
+        if self.sos is not None:
+            filter_power = np.abs(sosfreqz(self.sos, worN=hz, fs=self.sampling_rate)[1])**2
+        else:
+            filter_power = np.abs(sp.fftpack.fft(self.coefs,num_points))**2
+            filter_power = filter_power[0:len(hz)]
+
+        return hz, filter_power
+
+class StreamingFilter:
+    '''
+    Applies a filter kernel causally to a time series acquired chunk by chunk (e.g. real-time acquisition), keeping the filter state (delay line) between chunks.
+        Note: the concatenated outputs are equal to lfilter(kernel.coefs, 1, signal) (FIR) or sosfilt(kernel.sos, signal) (IIR) applied to the concatenated chunks (i.e. causal filtering, not zero-phase).
+    Input:
+        kernel: FilterKernel returned by design_firls_kernel or design_iir_kernel
+    Methods:
+        process(chunk, out=None): filters a new chunk (kx1 array, or kxm array for m channels) and returns the filtered chunk (written into out when provided, e.g. preallocated buffer)
+        group_delay(freqs=None): returns the group delay (in frames) introduced by the filter, constant for FIR kernels, evaluated at freqs (in Hz) for IIR filters [default = average over the pass band, weighted by the filter power]
+        reset(): sets the filter state back to zero (e.g. new recording)
+    Dependencies:
+        None
+    '''
+
+    def __init__(self, kernel):
+        self.kernel = kernel
+        self.reset()
+
+    def reset(self):
+        # Filter state, created with the first chunk (number of channels is not known before)
+        self._zi = None
+
+    def process(self, chunk, out=None):
+        chunk = np.asarray(chunk, dtype=float)
+        # Initialize filter state with zeros (one delay line per channel)
+        if self._zi is None:
+            if self.kernel.sos is not None:
+                self._zi = np.zeros((len(self.kernel.sos), 2) + np.shape(chunk)[1:])
+            else:
+                self._zi = np.zeros((len(self.kernel.coefs)-1,) + np.shape(chunk)[1:])
+        # Filter chunk and keep final state for the next chunk
+        if self.kernel.sos is not None:
+            filtered_chunk, self._zi = sosfilt(self.kernel.sos, chunk, axis=0, zi=self._zi)
+        else:
+            filtered_chunk, self._zi = lfilter(self.kernel.coefs, 1, chunk, axis=0, zi=self._zi)
+        if out is not None:
+            out[...] = filtered_chunk
+            filtered_chunk = out
+
+        return filtered_chunk
+
+    def group_delay(self, freqs=None):
+        # Linear-phase FIR kernel: constant delay of half the kernel length
+        if self.kernel.sos is None:
+            return (len(self.kernel.coefs)-1)/2
+        # IIR filter: frequency-dependent delay
+        if freqs is None:
+            # average delay over the pass band (i.e. gain above half power), weighted by the filter power
+            hz, filter_power = self.kernel.power_spectrum(2048)
+            pass_band = filter_power >= np.max(filter_power)/2
+            delay = self._sos_group_delay(hz[pass_band])
+            return np.average(delay, weights=filter_power[pass_band])
+        delay = self._sos_group_delay(np.atleast_1d(freqs))
+
+        return delay if np.ndim(freqs) > 0 else delay[0]
+
+    def _sos_group_delay(self, freqs):
+        # Sum of the delays of each second-order section (the equivalent high-order transfer function is numerically unusable for sharp, low cut-off filters)
+        # Note: numerators are normalized (gain does not change the delay, but a tiny gain is flagged as a singularity)
+        delay = np.zeros(len(freqs))
+        for section in self.kernel.sos:
+            delay += group_delay((section[:3]/np.max(np.abs(section[:3])), section[3:]), w=freqs, fs=self.kernel.sampling_rate)[1]
+
+        return delay
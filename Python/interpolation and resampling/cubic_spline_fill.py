@@ -5,14 +5,17 @@ import scipy as sp
 
 from scipy import interpolate
 
+from nan_gaps import GapIndex
+
 # FUNCTION
 
-def cubic_spline_fill(signal, mode=None):
+def cubic_spline_fill(signal, mode=None, local=None, neighbourhood=None, max_gap=None, out=None):
     '''
     Interpolates missing observations within a time series using a cubic spline.
     Notes:
         Only interpolates time series with NaN (otherwise return original time series)
         Does not interpolate empty time series (returns same empty time series)
+        Local mode: each gap (i.e. run of NaN) is filled using a small cubic spline fitted to the neighbouring observations only, and observed values are kept as is
     Input:
         signal: nx1 array: tested time series
         mode: select mode to deal with edge effect
@@ -21,81 +24,158 @@ def cubic_spline_fill(signal, mode=None):
             2: set edges to mean
             3: set edges to NaN [default]
             4: set edges to reflected signal
+        local: set to 1 to fill each gap using a spline fitted around the gap (gap-local mode) instead of a single spline fitted to the whole time series [default = 0]
+        neighbourhood: number of observations used on each side of a gap to fit the spline (local mode only, at least 1) [default = 10]
+        max_gap: maximal number of consecutive missing observations that are interpolated (longer gaps are left as NaN) [default = None, i.e. all gaps]
+        out: nx1 array in which the interpolated signal is written in local mode (e.g. signal itself to fill missing observations in place) [default = None]
     Output:
         signal_interp: new nx1 array with interpolated values
 
     Dependencies:
-        nan_find
+        nan_gaps
     '''
 
     # Deal with default values and potential missing input variables
     if mode == None:
         mode = 3
-
-    # If no missing observation -> return original signal
-    if np.shape(np.where(np.isnan(signal) == True))[1] == 0:
+    if local == None:
+        local = 0
+    if neighbourhood == None:
+        neighbourhood = 10
+
+    # Find missing observations
+    nan_logic = np.isnan(signal)
+    num_nan = np.count_nonzero(nan_logic)
+
+    # If no missing observation, or empty signal -> return original signal (copied into out if given)
+    if num_nan == 0 or num_nan == np.shape(signal)[0]:
+        if out is not None:
+            if out is not signal:
+                out[...] = signal
+            return out
 
         return signal
 
-    # If empty signal -> return original signal
-    elif np.shape(np.where(np.isnan(signal) == True))[1] == np.shape(signal)[0]:
+    elif local == 1:
 
-        return signal
+        return _local_spline_fill(signal, nan_logic, mode, neighbourhood, max_gap, out)
 
     else:
-        # Define frame vector
-        fr = np.arange(0, len(signal))
-
-        # Generate a NaNs logical array where the indices of each NaN observation is True
-        nan_logic, find_true = nan_find(signal)
-
-        # Find indices of non-missing observations
-        obs = find_true(~nan_logic)
-
-        # Isolate non-missing portion of the signal
-        a = fr[obs]
-        b = signal[obs]
-
-        # Find equation of the cubic spline that best fits the corresponding signal
-        cs = interpolate.CubicSpline(a, b)
-
-        # Initialization
-        signal_interp = np.array(np.empty(np.shape(signal)[0]))
-
-        # Apply cubic spline equation to interpolate between edges
-        signal_interp[obs[0]:obs[-1]] = cs(fr[obs[0]:obs[-1]])
-
-        # Change edges values to neighboring values to prevent edge effects
-        signal_interp[obs[0]] = signal_interp[obs[0]+1]
-        signal_interp[obs[-1]] = signal_interp[obs[-1]-1]
-
-        # Deal with edge effects
-        if mode == 0:
-            signal_interp[0:obs[0]] = 0
-            signal_interp[obs[-1]:] = 0
-        elif mode == 1:
-            signal_interp[0:obs[0]] = signal_interp[obs[0]]
-            signal_interp[obs[-1]:] = signal_interp[obs[-1]]
-        elif mode == 2:
-            signal_interp[0:obs[0]] = np.nanmean(signal)
-            signal_interp[obs[-1]:] = np.nanmean(signal)
-        elif mode == 3:
-            signal_interp[0:obs[0]] = np.nan
-            signal_interp[obs[-1]:] = np.nan
-        elif mode == 4:
-            pre = len(np.arange(fr[0], obs[0]))
-            post = len(np.arange(obs[-1], fr[-1]))
-            if pre > 0:
-                if obs[-1]-obs[0] < pre:
-                    signal_interp[obs[0]-(obs[-1]-obs[0]):obs[0]] = np.flip(signal_interp[obs[0]:obs[-1]])
-                    signal_interp[0:obs[0]-(obs[-1]-obs[0])] = signal_interp[obs[0]-(obs[-1]-obs[0])+1]
-                else:
-                    signal_interp[0:obs[0]] = np.flip(signal_interp[obs[0]:obs[0]+pre])
-            if post > 0:
-                if obs[-1]-post-1 < 0:
-                    signal_interp[obs[-1]:2*obs[-1]-obs[0]] = np.flip(signal_interp[obs[0]:obs[-1]])
-                    signal_interp[2*obs[-1]-obs[0]:] = signal_interp[2*obs[-1]-obs[0]-1]
-                else:
-                    signal_interp[obs[-1]:] = np.flip(signal_interp[obs[-1]-post-1:obs[-1]])
-
-        return signal_interp
+
+        return _global_spline_fill(signal, nan_logic, mode, max_gap)
+
+def _global_spline_fill(signal, nan_logic, mode, max_gap):
+    '''
+    Fills all missing observations using a cubic spline fitted to all observations, then deals with the edges (see cubic_spline_fill).
+        Note: signal can be a nx1 array, or a nxk array of k channels sharing the same missing observations (nan_logic, nx1 array), interpolated with a single vector-valued spline.
+    '''
+    # Define frame vector
+    fr = np.arange(0, len(signal))
+
+    # Find indices of non-missing observations
+    obs = np.flatnonzero(~nan_logic)
+
+    # Isolate non-missing portion of the signal
+    a = fr[obs]
+    b = signal[obs]
+
+    # Find equation of the cubic spline that best fits the corresponding signal
+    cs = interpolate.CubicSpline(a, b)
+
+    # Initialization
+    signal_interp = np.empty(np.shape(signal))
+
+    # Apply cubic spline equation to interpolate between edges
+    signal_interp[obs[0]:obs[-1]] = cs(fr[obs[0]:obs[-1]])
+
+    # Change edges values to neighboring values to prevent edge effects
+    signal_interp[obs[0]] = signal_interp[obs[0]+1]
+    signal_interp[obs[-1]] = signal_interp[obs[-1]-1]
+
+    # Deal with edge effects
+    if mode == 0:
+        signal_interp[0:obs[0]] = 0
+        signal_interp[obs[-1]:] = 0
+    elif mode == 1:
+        signal_interp[0:obs[0]] = signal_interp[obs[0]]
+        signal_interp[obs[-1]:] = signal_interp[obs[-1]]
+    elif mode == 2:
+        signal_interp[0:obs[0]] = np.nanmean(signal, axis=0)
+        signal_interp[obs[-1]:] = np.nanmean(signal, axis=0)
+    elif mode == 3:
+        signal_interp[0:obs[0]] = np.nan
+        signal_interp[obs[-1]:] = np.nan
+    elif mode == 4:
+        pre = len(np.arange(fr[0], obs[0]))
+        post = len(np.arange(obs[-1], fr[-1]))
+        if pre > 0:
+            if obs[-1]-obs[0] < pre:
+                signal_interp[obs[0]-(obs[-1]-obs[0]):obs[0]] = np.flip(signal_interp[obs[0]:obs[-1]], axis=0)
+                signal_interp[0:obs[0]-(obs[-1]-obs[0])] = signal_interp[obs[0]-(obs[-1]-obs[0])+1]
+            else:
+                signal_interp[0:obs[0]] = np.flip(signal_interp[obs[0]:obs[0]+pre], axis=0)
+        if post > 0:
+            if obs[-1]-post-1 < 0:
+                signal_interp[obs[-1]:2*obs[-1]-obs[0]] = np.flip(signal_interp[obs[0]:obs[-1]], axis=0)
+                signal_interp[2*obs[-1]-obs[0]:] = signal_interp[2*obs[-1]-obs[0]-1]
+            else:
+                signal_interp[obs[-1]:] = np.flip(signal_interp[obs[-1]-post-1:obs[-1]], axis=0)
+
+    # Leave gaps longer than max_gap as NaN
+    if max_gap is not None:
+        gaps = GapIndex(nan_logic)
+        for k in np.intersect1d(gaps.gaps_above(max_gap), gaps.interior()):
+            signal_interp[gaps.starts[k]:gaps.stops[k]] = np.nan
+
+    return signal_interp
+
+def _local_spline_fill(signal, nan_logic, mode, neighbourhood, max_gap, out):
+    '''
+    Fills each gap located between the first and last observations using a cubic spline fitted to the neighbourhood observations on each side of the gap, then deals with the edges (see cubic_spline_fill).
+        Note: signal can be a nx1 array, or a nxk array of k channels sharing the same missing observations (nan_logic, nx1 array).
+    '''
+    if neighbourhood < 1:
+        raise ValueError('neighbourhood must be at least 1 observation.')
+    n = len(signal)
+    # Mean of the observations (computed before filling, signal may be out)
+    if mode == 2:
+        mean = np.nanmean(signal, axis=0)
+    if out is None:
+        out = np.array(signal, dtype=float)
+    elif out is not signal:
+        out[...] = signal
+    signal_interp = out
+
+    # Indices of non-missing observations and runs of missing observations located between edges
+    obs = np.flatnonzero(~nan_logic)
+    gaps = GapIndex(nan_logic)
+    filled = gaps.interior()
+    if max_gap is not None:
+        filled = filled[gaps.lengths[filled] <= max_gap]
+
+    # Fill gaps
+    for start, stop in zip(gaps.starts[filled], gaps.stops[filled]):
+        # neighbourhood observations on each side of the gap
+        pos = np.searchsorted(obs, start)
+        fit = obs[max(0, pos-neighbourhood):pos+neighbourhood]
+        cs = interpolate.CubicSpline(fit, signal[fit])
+        signal_interp[start:stop] = cs(np.arange(start, stop))
+
+    # Deal with edge effects
+    pre = obs[0]
+    post = n - 1 - obs[-1]
+    if mode == 0:
+        signal_interp[0:pre] = 0
+        signal_interp[n-post:] = 0
+    elif mode == 1:
+        signal_interp[0:pre] = signal_interp[obs[0]]
+        signal_interp[n-post:] = signal_interp[obs[-1]]
+    elif mode == 2:
+        signal_interp[0:pre] = mean
+        signal_interp[n-post:] = mean
+    elif mode == 4:
+        # reflect signal around first and last observations (edge value kept when the signal is too short)
+        signal_interp[0:pre] = signal_interp[np.minimum(obs[0] + np.arange(pre-1, -1, -1), obs[-1])]
+        signal_interp[n-post:] = signal_interp[np.maximum(obs[-1] - np.arange(0, post), obs[0])]
+
+    return signal_interp
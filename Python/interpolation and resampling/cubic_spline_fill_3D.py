@@ -1,15 +1,15 @@
 # LIBRARIeS IMPORT
 
 import numpy as np
-import scipy as sp
 
-from scipy import interpolate
+from cubic_spline_fill_nd import cubic_spline_fill_nd
 
 # FUNCTION
 
 def cubic_spline_fill_3D(data, mode=None):
     '''
     Applies cubic_spline_fill to each dimension of a 3D time series.
+        Note: kept for compatibility, see cubic_spline_fill_nd (any number of channels, channels with the same missing observations interpolated together).
     Input:
         data: nx3 array: tested data set containing 3D time series
         mode: select mode to deal with edge effect
@@ -21,18 +21,7 @@ def cubic_spline_fill_3D(data, mode=None):
     Output:
         data_interp: new nx3 array with interpolated values
     Dependencies:
-        nan_find
-        cubic_spline_fill
+        cubic_spline_fill_nd
     '''
 
-    # Deal with default values and potential missing input variables
-    if mode == None:
-        mode = 3
-
-    # Apply cubic_spline_fill to each dimension of the 3D data set
-    a = cubic_spline_fill(data[:,0], mode=mode)
-    b = cubic_spline_fill(data[:,1], mode=mode)
-    c = cubic_spline_fill(data[:,2], mode=mode)
-    data_interp = np.transpose(np.array([a, b, c]))
-
-    return data_interp
+    return cubic_spline_fill_nd(data, mode=mode)
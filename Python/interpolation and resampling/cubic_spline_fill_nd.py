@@ -0,0 +1,68 @@
+# LIBRARIES IMPORT
+
+import numpy as np
+
+from cubic_spline_fill import _global_spline_fill, _local_spline_fill
+
+# FUNCTION
+
+def cubic_spline_fill_nd(data, mode=None, local=None, neighbourhood=None, max_gap=None, out=None):
+    '''
+    Applies cubic_spline_fill to each channel of a multidimensional data set (e.g. nxmx3 array of m markers).
+        Note: channels sharing the same missing observations (e.g. x, y and z coordinates of a marker) are interpolated together with a single vector-valued cubic spline.
+    Input:
+        data: nx... array: tested data set (first axis corresponding to time, e.g. nx3 array of a marker, or nxmx3 array of m markers)
+        mode: select mode to deal with edge effect
+            0: set edges to zero
+            1: set to edge value
+            2: set edges to mean
+            3: set edges to NaN [default]
+            4: set edges to reflected signal
+        local: set to 1 to fill each gap using a spline fitted around the gap (see cubic_spline_fill) [default = 0]
+        neighbourhood: number of observations used on each side of a gap to fit the spline (local mode only, at least 1) [default = 10]
+        max_gap: maximal number of consecutive missing observations that are interpolated (longer gaps are left as NaN) [default = None, i.e. all gaps]
+        out: array with the same shape as data in which the interpolated data set is written (e.g. preallocated buffer) [default = None]
+    Output:
+        data_interp: array with the same shape as data with interpolated values
+    Dependencies:
+        cubic_spline_fill
+    '''
+
+    # Deal with default values and potential missing input variables
+    if mode == None:
+        mode = 3
+    if local == None:
+        local = 0
+    if neighbourhood == None:
+        neighbourhood = 10
+
+    # Reshape data into columns (one column per channel)
+    data = np.asarray(data, dtype=float)
+    n = np.shape(data)[0]
+    channels = np.reshape(data, (n, -1))
+    if out is None:
+        out = np.empty(np.shape(data))
+    data_interp = np.reshape(out, np.shape(channels))
+    if not np.shares_memory(data_interp, out):
+        raise ValueError('out must be contiguous.')
+
+    # Group channels sharing the same missing observations (each NaN logical array packed into bytes and compared as a single value)
+    nan_logic = np.isnan(channels)
+    packed = np.ascontiguousarray(np.packbits(nan_logic, axis=0).T)
+    keys = packed.view(np.dtype((np.void, np.shape(packed)[1])))[:,0]
+    _, first, group = np.unique(keys, return_index=True, return_inverse=True)
+
+    # Interpolate all channels of each group at once
+    for g in range(0, len(first)):
+        cols = np.flatnonzero(group == g)
+        mask = nan_logic[:,first[g]]
+        num_nan = np.count_nonzero(mask)
+        if num_nan == 0 or num_nan == n:
+            # no missing observation or empty channels -> original channels
+            data_interp[:,cols] = channels[:,cols]
+        elif local == 1:
+            data_interp[:,cols] = _local_spline_fill(channels[:,cols], mask, mode, neighbourhood, max_gap, None)
+        else:
+            data_interp[:,cols] = _global_spline_fill(channels[:,cols], mask, mode, max_gap)
+
+    return out
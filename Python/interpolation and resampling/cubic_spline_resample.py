@@ -3,6 +3,8 @@
 import numpy as np
 import scipy as sp
 
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from scipy import interpolate
 
 # FUNCTION
@@ -12,13 +14,14 @@ def cubic_spline_resample(time, y, rf):
     Fits a cubic spline to the data and resamples the corresponding time series to the desired sampling rate.
     Input:
         time: nx1 array corresponding to the time (in secs)
-        y: nx1 array: tested time series (e.g. x coordinates of a marker)
+        y: nx1 array: tested time series (e.g. x coordinates of a marker), or nx... array corresponding to multiple channels (fitted at once with a single vector-valued cubic spline)
         rf: resampling frequency (Hz)
     Output:
         y_resampled: array corresponding to resampled time series
             Note: Keeps the original values of the time series
         time_resampled: array corresponding to resampled time
     '''
+    y = np.asarray(y)
     duration = time[-1]
     # calculate number of frames based on total duration and resampling rate
     num_fr = int(np.round(duration * rf, 0))
@@ -28,7 +31,7 @@ def cubic_spline_resample(time, y, rf):
         # generate an array that contains the indices of all frames after resampling
         fr_resampled = np.arange(0,num_fr+1)
         # find the equation of the cubic spline that best fits time series
-        cs = interpolate.CubicSpline(fr, y)
+        cs = interpolate.CubicSpline(fr, y, axis=0)
         # generate new time array based on resampling rate
         time_resampled = fr_resampled / rf
         # apply cubic spline equation to obtained resampled time series
@@ -42,3 +45,61 @@ def cubic_spline_resample(time, y, rf):
         y_resampled = y[fr_resampled]
 
     return y_resampled, time_resampled
+
+def cubic_spline_resample_batch(times, ys, rf, workers=None):
+    '''
+    Applies cubic_spline_resample to a collection of trials with different durations (e.g. all trials of a session).
+        Note: trials sharing the same time vector are resampled together (time grid computed once, single vector-valued cubic spline for all their channels).
+        Note: with workers > 1, groups of trials are distributed over a pool of processes (scripts must then be protected by if __name__ == '__main__').
+    Input:
+        times: list of k arrays (nix1 arrays corresponding to the time of trial i, in secs), or a single nx1 array shared by all trials
+        ys: list of k arrays (nix1 arrays, or nix... arrays corresponding to multiple channels, same channels for all trials)
+        rf: resampling frequency (Hz)
+        workers: number of processes used to resample the trials [default = 1]
+    Output:
+        y_resampled: array corresponding to all resampled trials concatenated along the first axis
+        time_resampled: array corresponding to the resampled time of all trials concatenated
+        offsets: (k+1)x1 array such that trial i corresponds to y_resampled[offsets[i]:offsets[i+1]]
+    Dependencies:
+        cubic_spline_resample
+    '''
+
+    # Deal with default values and potential missing input variables
+    if workers == None:
+        workers = 1
+    num_trials = len(ys)
+    if num_trials == 0:
+        return np.empty(0), np.empty(0), np.zeros(1, dtype=int)
+    if np.ndim(times[0]) == 0:
+        times = [times]*num_trials
+
+    # Group trials sharing the same time vector
+    groups = {}
+    for i in range(0, num_trials):
+        time = np.asarray(times[i], dtype=float)
+        groups.setdefault((len(time), time.tobytes()), []).append(i)
+    group_trials = list(groups.values())
+    group_times = [np.asarray(times[trials[0]], dtype=float) for trials in group_trials]
+    group_ys = [np.stack([np.asarray(ys[i]) for i in trials], axis=1) for trials in group_trials]
+
+    # Resample each group (trials as second axis, i.e. additional channels of the spline)
+    if workers > 1 and len(group_trials) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(cubic_spline_resample, group_times, group_ys, repeat(rf)))
+    else:
+        results = [cubic_spline_resample(time, y, rf) for time, y in zip(group_times, group_ys)]
+
+    # Concatenate all trials in their original order
+    resampled = [None]*num_trials
+    for trials, (y_group, time_group) in zip(group_trials, results):
+        for j, i in enumerate(trials):
+            resampled[i] = (y_group[:,j], time_group)
+    lengths = [len(time_trial) for _, time_trial in resampled]
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(int)
+    y_resampled = np.empty((offsets[-1],) + np.shape(resampled[0][0])[1:])
+    time_resampled = np.empty(offsets[-1])
+    for i in range(0, num_trials):
+        y_resampled[offsets[i]:offsets[i+1]] = resampled[i][0]
+        time_resampled[offsets[i]:offsets[i+1]] = resampled[i][1]
+
+    return y_resampled, time_resampled, offsets
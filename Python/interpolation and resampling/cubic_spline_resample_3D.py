@@ -1,15 +1,15 @@
 # LIBRARIES IMPORT
 
 import numpy as np
-import scipy as sp
 
-from scipy import interpolate
+from cubic_spline_resample import cubic_spline_resample
 
 # FUNCTION
 
 def cubic_spline_resample_3D(time, y, rf):
     '''
     Applies cubic_spline_resample to each dimension of a 3D time series.
+        Note: kept for compatibility, cubic_spline_resample accepts nx3 arrays directly.
     Input:
         time: nx1 array corresponding to the time (in secs)
         y: nx3 array: tested time series (e.g. x coordinates of a marker)
@@ -21,9 +21,7 @@ def cubic_spline_resample_3D(time, y, rf):
     Dependencies:
         cubic_spline_resample
     '''
-    a, time_resampled = cubic_spline_resample(time, y[:,0], rf)
-    b, _ = cubic_spline_resample(time, y[:,1], rf)
-    c, _ = cubic_spline_resample(time, y[:,2], rf)
-    Y_resampled = np.transpose(np.array([a, b, c]))
+    # All dimensions fitted at once (single vector-valued cubic spline)
+    Y_resampled, time_resampled = cubic_spline_resample(time, y, rf)
 
     return Y_resampled, time_resampled
@@ -0,0 +1,91 @@
+# LIBRARIES IMPORT
+
+import numpy as np
+
+# FUNCTION
+
+def nan_gaps(y, axis=None):
+    '''
+    Finds all gaps (i.e. runs of consecutive NaN) of a time series, or of each channel of a data set, in a single vectorized pass.
+    Input:
+        y: nx1 array corresponding to the tested time series, or nx... array corresponding to multiple channels (gaps found along axis)
+        axis: axis of y corresponding to time (i.e. frames) [default = 0]
+    Output:
+        gaps: GapIndex containing the start, stop and length of each gap (see GapIndex)
+    Dependencies:
+        None
+    Example:
+        gaps = nan_gaps(y)
+        gaps.starts, gaps.stops -> first and last (excluded) frames of each gap
+        gaps.largest_gap() -> length of the largest gap
+        gaps.coverage() -> percentage of non-missing observations
+        gaps.gaps_above(10) -> indices of the gaps longer than 10 frames
+    '''
+
+    return GapIndex(np.isnan(y), axis=axis)
+
+# CLASS
+
+class GapIndex:
+    '''
+    Index of all gaps (i.e. runs of consecutive True values of a NaN logical array) of a time series, or of each channel of a data set.
+        Note: gaps are sorted by channel, then by start frame. Statistics per channel are computed once, so queries do not rescan the data.
+    Input:
+        nan_logic: nx1 logical array where the indices of each NaN observation is True, or nx... logical array for multiple channels
+        axis: axis of nan_logic corresponding to time (i.e. frames) [default = 0]
+    Attributes:
+        starts: array corresponding to the first frame of each gap
+        stops: array corresponding to the last frame (excluded) of each gap
+        lengths: array corresponding to the number of frames of each gap
+        channels: array corresponding to the channel of each gap (flat index of the channel, 0 for a single time series)
+        n_frames: number of frames of the time series
+        channel_shape: shape of the channels (i.e. shape of nan_logic without the time axis)
+        nan_count: number of missing observations of each channel (array with shape channel_shape, or scalar for a single time series)
+    Methods:
+        largest_gap(): returns the length of the largest gap of each channel (0 if no gap)
+        coverage(): returns the percentage of non-missing observations of each channel
+        gaps_above(threshold): returns the indices of the gaps longer than threshold frames
+        interior(): returns the indices of the gaps located between the first and last observations (i.e. not touching the edges)
+    Dependencies:
+        None
+    '''
+
+    def __init__(self, nan_logic, axis=None):
+        if axis == None:
+            axis = 0
+        nan_logic = np.moveaxis(np.asarray(nan_logic, dtype=bool), axis, 0)
+        self.n_frames = np.shape(nan_logic)[0]
+        self.channel_shape = np.shape(nan_logic)[1:]
+        # Run-length encoding of all channels at once (one row per channel, padded with False on each side)
+        num_channels = int(np.prod(self.channel_shape))
+        padded = np.zeros((num_channels, self.n_frames+2), dtype=np.int8)
+        padded[:,1:-1] = np.reshape(nan_logic, (self.n_frames, num_channels)).T
+        edges = np.diff(padded, axis=1)
+        self.channels, self.starts = np.nonzero(edges == 1)
+        self.stops = np.nonzero(edges == -1)[1]
+        self.lengths = self.stops - self.starts
+        # Statistics per channel
+        self._largest = np.zeros(num_channels, dtype=int)
+        np.maximum.at(self._largest, self.channels, self.lengths)
+        self.nan_count = self._reshape(np.bincount(self.channels, weights=self.lengths, minlength=num_channels).astype(int))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def largest_gap(self):
+        return self._reshape(self._largest)
+
+    def coverage(self):
+        if self.n_frames == 0:
+            return self._reshape(np.zeros(np.shape(self._largest)))
+        return 100*(1 - np.asarray(self.nan_count)/self.n_frames)
+
+    def gaps_above(self, threshold):
+        return np.flatnonzero(self.lengths > threshold)
+
+    def interior(self):
+        return np.flatnonzero((self.starts > 0) & (self.stops < self.n_frames))
+
+    def _reshape(self, values):
+        # single time series -> scalar
+        return np.reshape(values, self.channel_shape)[()]
@@ -0,0 +1,157 @@
+# LIBRARIES IMPORT
+
+import numpy as np
+import functools
+
+from fractions import Fraction
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import firwin
+from scipy.signal import resample_poly
+
+# FUNCTION
+
+def polyphase_resample(y, sampling_rate=None, rf=None, up=None, down=None, axis=None):
+    '''
+    Resamples a time series to the desired sampling rate using a polyphase rational (up/down) resampler with an anti-aliasing FIR filter.
+        Note: unlike cubic_spline_resample, frequencies above the new Nyquist frequency are removed before downsampling (no aliasing), and the cost is linear in the number of frames.
+        Note: the anti-aliasing filter is designed once per (up, down) pair and cached (see antialias_kernel).
+    Input:
+        y: nx1 array: tested time series (e.g. x coordinates of a marker), or nxm array corresponding to m channels (resampled along axis)
+        sampling_rate: original sampling rate (Hz)
+        rf: resampling frequency (Hz)
+        up: upsampling factor (used with down instead of sampling_rate and rf)
+        down: downsampling factor (used with up instead of sampling_rate and rf)
+        axis: axis of y corresponding to time (i.e. frames) [default = 0]
+    Output:
+        y_resampled: array corresponding to resampled time series
+        time_resampled: array corresponding to resampled time (in secs, only when sampling_rate is known, None otherwise)
+    Dependencies:
+        None
+    '''
+
+    # Deal with default values and potential missing input variables
+    if axis == None:
+        axis = 0
+
+    # Define rational resampling factors
+    up, down = resampling_factors(sampling_rate, rf, up, down)
+
+    # Apply polyphase resampling with cached anti-aliasing filter
+    y_resampled = resample_poly(y, up, down, axis=axis, window=antialias_kernel(up, down))
+
+    # Generate new time array based on resampling rate
+    if sampling_rate == None:
+        time_resampled = None
+    else:
+        time_resampled = np.arange(0, np.shape(y_resampled)[axis]) / (sampling_rate*up/down)
+
+    return y_resampled, time_resampled
+
+def resampling_factors(sampling_rate=None, rf=None, up=None, down=None):
+    '''
+    Converts a pair of sampling rates into the smallest integer resampling factors (up/down = rf/sampling_rate).
+    Input:
+        sampling_rate: original sampling rate (Hz)
+        rf: resampling frequency (Hz)
+        up: upsampling factor (returned as is, after simplification, when defined with down)
+        down: downsampling factor (returned as is, after simplification, when defined with up)
+    Output:
+        up: upsampling factor
+        down: downsampling factor
+    Dependencies:
+        None
+    '''
+    if up == None or down == None:
+        if sampling_rate == None or rf == None:
+            raise ValueError('Either sampling_rate and rf, or up and down must be defined.')
+        ratio = Fraction(rf/sampling_rate).limit_denominator(1000)
+    else:
+        ratio = Fraction(int(up), int(down))
+
+    return ratio.numerator, ratio.denominator
+
+@functools.lru_cache(maxsize=128)
+def antialias_kernel(up, down):
+    '''
+    Designs (or retrieves from cache) the anti-aliasing low-pass FIR filter used for polyphase resampling (same design as scipy.signal.resample_poly).
+        Note: returned array is shared between calls and therefore read-only.
+    Input:
+        up: upsampling factor
+        down: downsampling factor
+    Output:
+        kernel: (20*max(up, down)+1,) array (or (1,) array if up = down = 1) corresponding to the filter coefficients (unit gain, cutoff at the lowest Nyquist frequency)
+    Dependencies:
+        None
+    '''
+    max_rate = max(up, down)
+    if max_rate == 1:
+        # no resampling (identity filter)
+        kernel = np.ones(1)
+    else:
+        kernel = firwin(2*10*max_rate+1, 1/max_rate, window=('kaiser', 5.0))
+    kernel.flags.writeable = False
+
+    return kernel
+
+# CLASS
+
+class StreamingResampler:
+    '''
+    Resamples a time series acquired chunk by chunk (e.g. live stream) using the same polyphase filter as polyphase_resample, keeping the filter history between chunks.
+        Note: filtering is causal, so the concatenated outputs are delayed by delay frames (at the new sampling rate) compared to polyphase_resample, and are equal to scipy.signal.upfirdn(up*antialias_kernel(up, down), y, up, down) for the frames already computed.
+    Input:
+        sampling_rate: original sampling rate (Hz)
+        rf: resampling frequency (Hz)
+        up: upsampling factor (used with down instead of sampling_rate and rf)
+        down: downsampling factor (used with up instead of sampling_rate and rf)
+    Attributes:
+        up, down: resampling factors
+        delay: delay introduced by the filter (in frames at the new sampling rate)
+    Methods:
+        process(chunk): adds a new chunk (kx1 array, or kxm array for m channels) and returns all resampled frames that can be computed
+        reset(): clears the filter history
+    Dependencies:
+        None
+    '''
+
+    def __init__(self, sampling_rate=None, rf=None, up=None, down=None):
+        self.up, self.down = resampling_factors(sampling_rate, rf, up, down)
+        kernel = self.up*antialias_kernel(self.up, self.down)
+        # Polyphase decomposition of the kernel (phase p uses coefficients p, p+up, p+2*up, ...), reversed to match the frame order of the history
+        self._taps = int(np.ceil(len(kernel)/self.up))
+        phases = np.zeros(self.up*self._taps)
+        phases[0:len(kernel)] = kernel
+        self._phases = np.reshape(phases, (self._taps, self.up)).T[:,::-1]
+        self.delay = (len(kernel)-1)/2/self.down
+        self.reset()
+
+    def reset(self):
+        # Last input frames (initialized with zeros when the first chunk is received)
+        self._history = None
+        # Number of input frames received and output frames returned
+        self._n_in = 0
+        self._n_out = 0
+
+    def process(self, chunk):
+        chunk = np.asarray(chunk, dtype=float)
+        if self._history is None:
+            self._history = np.zeros((self._taps-1,) + np.shape(chunk)[1:])
+        buf = np.concatenate((self._history, chunk))
+        # Frame number (in the original signal) of the first frame of buf
+        first = self._n_in - (self._taps-1)
+        self._n_in += np.shape(chunk)[0]
+        # Output frames whose most recent input frame has been received
+        out_idx = np.arange(self._n_out, -(-self._n_in*self.up // self.down))
+        newest = out_idx*self.down // self.up
+        phase = out_idx*self.down % self.up
+        # Weighted sum of the last taps input frames of each output frame (no output frame, e.g. empty chunk -> empty array)
+        if len(out_idx) == 0:
+            resampled_chunk = np.empty((0,) + np.shape(chunk)[1:])
+        else:
+            windows = sliding_window_view(buf, self._taps, axis=0)[newest-(self._taps-1)-first]
+            resampled_chunk = np.einsum('ik,i...k->i...', self._phases[phase], windows)
+        # Update history
+        self._history = buf[np.shape(buf)[0]-(self._taps-1):]
+        self._n_out += len(out_idx)
+
+        return resampled_chunk
@@ -1,18 +1,21 @@
 # LIBRARIES IMPORT
 
 import numpy as np
+import functools
 from scipy import interpolate               # for interpolation
 
 # FUNCTION
 
-def reshape_data(data, reshape_length):
+def reshape_data(data, reshape_length, out=None):
     '''
     Reshape a data set to a specified length.
         If reshape length > original length, then data set will be upsampled using a cubic spline fit.
         If reshape length < original length, then data set will be downsampled by selecting data point along original signal(s).
+        Note: all variables are fitted at once with a single vector-valued cubic spline.
     Input:
         data: nxm array -> original data set (n=number of observation, length | m: number of variables)
         reshape_length: desired number of observations (i.e. new data length)
+        out: reshape_lengthxm array in which the reshaped data set is written (e.g. preallocated buffer) [default = None]
     Output:
         reshaped_data: reshape_lengthxm array containing the reshaped data set
         reshape_idx: reshape_lengthx1 array containing the index of the observations that will be maintained in the reshaped signal (equally distributed)
@@ -20,41 +23,64 @@ def reshape_data(data, reshape_length):
 
     #   Calculate original data length
     original_length = len(data)
-    #   Initialize reshaped data array
-    reshaped_data = np.zeros(reshape_length)
-    reshape_idx = range(0, reshape_length)
-    #   If data has only one column
-    if len(np.shape(data)) == 1:
-        #   Resampling
-        #       Define new indices vector
-        reshaped_idx = np.arange(0, reshape_length, reshape_length/original_length)
-        #       Find the equation of the cubic spline that best fits time series
-        if len(np.arange(0, reshape_length, reshape_length/original_length)) > len(data):
-            cs = interpolate.CubicSpline(reshaped_idx[0:len(reshaped_idx)-1], data)
-        else:
-            cs = interpolate.CubicSpline(reshaped_idx, data)
-        #       Apply cubic spline equation to obtained resampled time series
-        y_resampled = cs(range(0,reshape_length))
-        #   Add current resampled vector to resampled array
-        reshaped_data = np.vstack([reshaped_data, y_resampled])
-    #   If data has multiple columns
-    else:
-        for i in range(0, np.shape(data)[1]):
-            #   Calculate coefficients for cubic spline equation that fits the data
-            cs = interpolate.CubicSpline(np.arange(0, reshape_length, reshape_length/original_length)[0:len(data[:,i])], data[:,i])
-            #       Apply cubic spline equation to obtained resampled time series
-            y_resampled = cs(range(0,reshape_length))
-            #   Add current resampled vector to resampled array
-            reshaped_data = np.vstack([reshaped_data, y_resampled])
-    #   Remove first row of zeros
-    if len(np.shape(data)) == 1:
-        reshaped_data = reshaped_data[1:]
-    else:
-        reshaped_data = reshaped_data[1:,:]
-    #   Transpose array to match with usual format (row = observation, column = variable)
-    reshaped_data = np.transpose(reshaped_data)
-    #   If only one column, ensure to have a consistent output with shape (reshape length,)
-    if len(np.shape(reshaped_data)) == 1:
-        reshaped_data = reshaped_data[:,0]
-
-    return reshaped_data, reshape_idx
+    #   Define original and new indices vectors (shared between calls)
+    original_idx, reshape_idx = reshape_grid(original_length, reshape_length)
+    #   Find the equation of the cubic spline that best fits all time series
+    cs = interpolate.CubicSpline(original_idx, data, axis=0)
+    #   Apply cubic spline equation to obtained resampled time series
+    reshaped_data = cs(reshape_idx)
+    if out is not None:
+        out[...] = reshaped_data
+        reshaped_data = out
+
+    return reshaped_data, range(0, reshape_length)
+
+def reshape_cycles(cycles, reshape_length, out=None):
+    '''
+    Reshape a collection of data sets with different lengths (e.g. gait cycles) to the same specified length (see reshape_data).
+        Note: data sets with the same length are fitted together with a single vector-valued cubic spline.
+    Input:
+        cycles: list of k arrays (nixm arrays -> data set of cycle i, with ni observations and m variables, same m for all cycles)
+        reshape_length: desired number of observations (i.e. new data length)
+        out: kxreshape_lengthxm array in which the reshaped data sets are written (e.g. preallocated buffer) [default = None]
+    Output:
+        reshaped_cycles: kxreshape_lengthxm array containing the reshaped data sets (kxreshape_length array if cycles are nx1 arrays)
+    '''
+
+    # Initialize reshaped data sets
+    num_cycles = len(cycles)
+    if out is None:
+        channel_shape = np.shape(cycles[0])[1:] if num_cycles > 0 else ()
+        out = np.empty((num_cycles, reshape_length) + channel_shape)
+    reshaped_cycles = out
+
+    # Reshape all cycles with the same length at once
+    lengths = np.array([len(cycle) for cycle in cycles], dtype=int)
+    for original_length in np.unique(lengths):
+        idx = np.flatnonzero(lengths == original_length)
+        original_idx, reshape_idx = reshape_grid(original_length, reshape_length)
+        #   cycles as second axis (i.e. additional variables of the spline)
+        data = np.stack([cycles[i] for i in idx], axis=1)
+        cs = interpolate.CubicSpline(original_idx, data, axis=0)
+        reshaped_cycles[idx] = np.moveaxis(cs(reshape_idx), 1, 0)
+
+    return reshaped_cycles
+
+@functools.lru_cache(maxsize=128)
+def reshape_grid(original_length, reshape_length):
+    '''
+    Generates (or retrieves from cache) the indices of the original observations on the reshaped scale, and the indices of the reshaped observations.
+        Note: returned arrays are shared between calls and therefore read-only.
+    Input:
+        original_length: number of observations of the original data set
+        reshape_length: desired number of observations
+    Output:
+        original_idx: original_lengthx1 array corresponding to the position of the original observations on the reshaped scale
+        reshape_idx: reshape_lengthx1 array corresponding to the indices of the reshaped observations
+    '''
+    original_idx = np.arange(0, reshape_length, reshape_length/original_length)[0:original_length]
+    reshape_idx = np.arange(0, reshape_length)
+    for idx in (original_idx, reshape_idx):
+        idx.flags.writeable = False
+
+    return original_idx, reshape_idx
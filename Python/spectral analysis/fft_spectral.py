@@ -1,60 +1,82 @@
 # LIBRARIES IMPORT
 
 import numpy as np
-import scipy.fftpack
+import scipy.fft
 import matplotlib.pyplot as plt
 
 # FUNCTION
 
-def fft_spectral(signal, sampling_rate=None, plotting=None):
+def fft_spectral(signal, sampling_rate=None, plotting=None, n_fft=None, axis=None, reconstruct=None, workers=None):
     '''
     Applies a Fast Fourier Transform (FFT) to perform the spectral analysis of a time series.
+        Note: uses the real-input FFT (only the non-negative frequencies of a real signal are computed, i.e. half the work and memory of the complex FFT).
     Input:
-        signal: nx1 array corresponding to the tested time series
+        signal: nx1 array corresponding to the tested time series, or nxm array corresponding to m channels (transformed along axis)
         sampling_rate: corresponding sampling rate of the time series (i.e. how many frames per seconds, in Hz) [default = len(signal)]
         plotting: set to 1 if you wish to see the resulting figures [default = 0]
+        n_fft: number of points of the FFT (signal is zero-padded if n_fft > n, or cropped if n_fft < n), or 'fast' to pad the signal to the next fast FFT length [default = n]
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
+        reconstruct: set to 1 if you wish to compute the reconstructed signal using the inverse FFT [default = 0, or 1 if plotting = 1]
+        workers: number of threads used to compute the FFT of multiple channels (negative values count from the number of CPUs, e.g. -1 = all CPUs) [default = 1]
     Output:
-        fourier_signal: nx1 array corresponding to the fourier transform of the time series
-        amp_spectrum: nx1 array corresponding to amplitude spectrum of the time series (frequency space)
-        recon_signal: nx1 array corresponding to the reconstructed signal using the inverse FFT
+        fourier_signal: (n_fft/2+1)x1 array (or (n_fft/2+1)xm array) corresponding to the fourier transform of the time series (non-negative frequencies)
+        amp_spectrum: (n_fft/2+1)x1 array (or (n_fft/2+1)xm array) corresponding to amplitude spectrum of the time series (frequency space)
+        freq_spectr: (n_fft/2+1)x1 array corresponding to the frequency vector (in Hz)
+        recon_signal: nx1 array (or nxm array) corresponding to the reconstructed signal using the inverse FFT (first n_fft frames if n_fft < n, None if not requested)
         plot (optional): plot showing the resulting signal and its inverse reconstruction in time and frequency space
     Dependencies:
         None
     '''
 
     # Deal with default values and potential missing input variables
+    signal = np.asarray(signal)
+    if axis == None:
+        axis = 0
+    n = np.shape(signal)[axis]
     if sampling_rate == None:
-        sampling_rate = len(signal)
+        sampling_rate = n
     if plotting == None:
         plotting = 0
+    if reconstruct == None:
+        reconstruct = plotting
+    if n_fft is None:
+        n_fft = n
+    elif n_fft == 'fast':
+        n_fft = scipy.fft.next_fast_len(n, real=True)
 
     # Define time vector
-    time = np.arange(0, len(signal))/sampling_rate
+    time = np.arange(0, n)/sampling_rate
 
-    # Apply static Fast Fourier Transform to signal
-    fourier_signal = scipy.fftpack.fft(signal)
+    # Apply static Fast Fourier Transform to signal (real input, signal zero-padded to n_fft frames)
+    fourier_signal = scipy.fft.rfft(signal, n=n_fft, axis=axis, workers=workers)
 
-    # Calculate corresponding amplitude spectrum
-    amp_spectrum = 2*np.abs(fourier_signal)/len(signal)
+    # Calculate corresponding amplitude spectrum (normalized by the number of frames transformed, i.e. excluding padded frames)
+    amp_spectrum = 2*np.abs(fourier_signal)/min(n, n_fft)
 
     # Define frequency spectrum as a vector (in Hz)
-    freq_spectr = np.linspace(0, sampling_rate/2, int(np.floor(len(signal)/2)+1))
+    freq_spectr = scipy.fft.rfftfreq(n_fft, 1/sampling_rate)
 
-    # Reconstruct signal using inverse Fast Fourrier Transform
-    recon_signal = np.real(scipy.fftpack.ifft(fourier_signal))
+    # Reconstruct signal using inverse Fast Fourrier Transform (padded frames removed, only the first n_fft frames if the signal was cropped)
+    if reconstruct == 1:
+        recon_signal = scipy.fft.irfft(fourier_signal, n=n_fft, axis=axis, workers=workers)
+        recon_signal = np.take(recon_signal, np.arange(0, min(n, n_fft)), axis=axis)
+    else:
+        recon_signal = None
 
     # Plotting
     if plotting == 1:
-        plt.plot(time, signal, label='Original')
-        plt.plot(time, recon_signal, m='+', label='IFFT reconstructed')
+        plt.plot(time, np.moveaxis(signal, axis, 0), label='Original')
+        plt.plot(time[0:min(n, n_fft)], np.moveaxis(recon_signal, axis, 0), marker='+', linestyle='None', label='IFFT reconstructed')
         plt.xlabel('Time [sec])')
         plt.ylabel('Amplitude')
         plt.title('Time domain')
         plt.legend()
         plt.show()
 
-        plt.stem(freq_spectr, amp_spectrum[0:freq_spectr], 'k')
+        plt.plot(freq_spectr, np.moveaxis(amp_spectrum, axis, 0), 'k')
         plt.xlabel('Frequency [Hz]')
         plt.ylabel('Amplitude')
         plt.title('Frequency domain')
         plt.show()
+
+    return fourier_signal, amp_spectrum, freq_spectr, recon_signal
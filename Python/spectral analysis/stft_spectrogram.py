@@ -0,0 +1,89 @@
+# LIBRARIES IMPORT
+
+import numpy as np
+import scipy.fft
+import matplotlib.pyplot as plt
+
+from welch_method import spectral_window, welch_periodograms, welch_segments, welch_step
+
+# FUNCTION
+
+def stft_spectrogram(signal, sampling_rate=None, window=None, overlap=None, plotting=None, axis=None, window_type=None, scaling=None, dtype=None, frame_chunk=None, out=None):
+    '''
+    Applies a Short-Time Fourier Transform (STFT) to a time series to obtain its spectrogram (i.e. power spectrum of each window, as in Welch's method but without averaging).
+        Note: uses the same segmentation, windows and batched real-input FFT as welch_method (i.e. each FFT is only computed once).
+        Note: when frame_chunk is set, the spectrogram is computed frame_chunk windows at a time and written into out (e.g. np.memmap), so recordings larger than memory can be processed.
+    Input:
+        signal: nx1 array corresponding to the tested time series, or nxm array corresponding to m channels (analysed along axis)
+        sampling_rate: corresponding sampling rate of the time series (i.e. how many frames per seconds, in Hz) [default = len(signal)]
+        window: number of frames used to define the size of the window [default = sampling rate]
+        overlap: number of frames where two consecutive windows will overlap (0 <= overlap < window) [default = half of window]
+        plotting: set to 1 if you wish to see the resulting spectrogram (first channel) [default = 0]
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
+        window_type: type of window used to taper each segment (any window accepted by scipy.signal.get_window) [default = 'hann']
+        scaling: 'density' (power spectral density) or 'spectrum' (power spectrum), see welch_method [default = 'density']
+        dtype: data type of the spectrogram (e.g. np.float32 to halve memory, FFTs are then computed in single precision) [default = np.float64]
+        frame_chunk: maximum number of windows transformed at once [default = None, i.e. all windows at once]
+        out: array with the same shape as spectrogram in which the spectrogram is written (e.g. np.memmap) [default = None]
+    Output:
+        spectrogram: (window/2+1)x(number of windows) array (or (window/2+1)x(number of windows)xm array) corresponding to the power of each window
+        freq_spectr: (window/2+1)x1 array corresponding to the frequency vector (in Hz)
+        time_spectr: (number of windows)x1 array corresponding to the center of each window (in secs)
+        plot (optional): plot showing the spectrogram
+    Dependencies:
+        welch_method.py
+    '''
+
+    # Deal with default values and potential missing input variables
+    signal = np.asarray(signal)
+    if axis == None:
+        axis = 0
+    if sampling_rate == None:
+        sampling_rate = np.shape(signal)[axis]
+    if window == None:
+        window = sampling_rate
+    if plotting == None:
+        plotting = 0
+    if window_type == None:
+        window_type = 'hann'
+    if scaling == None:
+        scaling = 'density'
+    if dtype == None:
+        dtype = np.float64
+    window = int(window)
+    step = welch_step(window, overlap)
+
+    # Read all segments as a strided view (shape: segments x channels x window)
+    data = np.moveaxis(signal, axis, 0)
+    segments = welch_segments(data, window, step)
+    num_segments = np.shape(segments)[0]
+    if frame_chunk == None:
+        frame_chunk = max(num_segments, 1)
+
+    # Define frequency and time vectors
+    freq_spectr = scipy.fft.rfftfreq(window, 1/sampling_rate)
+    time_spectr = (np.arange(0, num_segments)*step + window/2)/sampling_rate
+
+    # Define window (same precision as the spectrogram)
+    taper = spectral_window(window_type, window).astype(dtype, copy=False)
+
+    # Initialize spectrogram
+    if out is None:
+        out = np.empty((len(freq_spectr), num_segments) + np.shape(data)[1:], dtype=dtype)
+    spectrogram = out
+
+    # Compute power of each segment (frame_chunk segments at a time), frequencies as first axis
+    for start in range(0, num_segments, frame_chunk):
+        power = welch_periodograms(np.asarray(segments[start:start+frame_chunk], dtype=dtype), taper, sampling_rate, scaling)
+        spectrogram[:, start:start+np.shape(power)[0]] = np.moveaxis(power, -1, 0)
+
+    # Plotting
+    if plotting == 1:
+        plt.pcolormesh(time_spectr, freq_spectr, np.reshape(spectrogram, (len(freq_spectr), num_segments, -1))[:,:,0], shading='nearest')
+        plt.xlabel('Time [sec]')
+        plt.ylabel('Frequency [Hz]')
+        plt.title('Spectrogram')
+        plt.colorbar()
+        plt.show()
+
+    return spectrogram, freq_spectr, time_spectr
@@ -1,90 +1,110 @@
 # LIBRARIES IMPORT
 
 import numpy as np
-import scipy.fftpack
+import functools
+import scipy.fft
+import scipy.signal
 import matplotlib.pyplot as plt
 
+from numpy.lib.stride_tricks import sliding_window_view
+
 # FUNCTION
 
-def welch_method(signal, sampling_rate=None, window=None, overlap=None, plotting=None):
+def welch_method(signal, sampling_rate=None, window=None, overlap=None, plotting=None, axis=None, window_type=None, scaling=None, segment_chunk=None):
     '''
     Applies Welch's method to a time series for spectral density estimation.
+        Note: all segments are read as a strided view of the signal (no copy), tapered by a cached window and transformed at once with a real-input FFT (segment_chunk segments at a time to limit memory).
     Input:
-        signal: nx1 array corresponding to the tested time series
+        signal: nx1 array corresponding to the tested time series, or nxm array corresponding to m channels (analysed along axis)
         sampling_rate: corresponding sampling rate of the time series (i.e. how many frames per seconds, in Hz) [default = len(signal)]
         window: number of frames used to define the size of the window (i.e. how many data points are included in each isolated portion of the original signal) [default = sampling rate]
-        overlap: number of frames where two consecutive windows will overlap [default = half of sampling rate]
+        overlap: number of frames where two consecutive windows will overlap (0 <= overlap < window) [default = half of window]
         plotting: set to 1 if you wish to see the resulting filtered signal [default = 0]
+        axis: axis of signal corresponding to time (i.e. frames) [default = 0]
+        window_type: type of window used to taper each segment (any window accepted by scipy.signal.get_window, e.g. 'hann', 'hamming', 'blackman', ('kaiser', 8)) [default = 'hann']
+        scaling: select the scaling of the power spectrum
+            'density': power spectral density (in V**2/Hz if signal is in V) [default]
+            'spectrum': power spectrum (in V**2)
+        segment_chunk: maximum number of segments transformed at once (i.e. memory cap) [default = None, i.e. all segments at once]
     Output:
-        welch_power: corresponding power spectrum using Welch's method
-        plot (optional): plots showing (1) defined Hann window and the corresponding edge attenuation on a random sample, and (2) the comparison between the power spectra obtained via Static FFT and Welch's method
+        welch_power: (window/2+1)x1 array (or (window/2+1)xm array) corresponding to power spectrum using Welch's method (one-sided)
+        freq_spectr: (window/2+1)x1 array corresponding to the frequency vector (in Hz)
+        plot (optional): plots showing (1) defined window and the corresponding edge attenuation on a random sample, and (2) the comparison between the power spectra obtained via Static FFT and Welch's method
     Dependencies:
         None
     '''
 
     # Deal with default values and potential missing input variables
+    signal = np.asarray(signal)
+    if axis == None:
+        axis = 0
     if sampling_rate == None:
-        sampling_rate = len(signal)
+        sampling_rate = np.shape(signal)[axis]
     if window == None:
         window = sampling_rate
-    if overlap == None:
-        overlap = np.round(sampling_rate/2)
     if plotting == None:
         plotting = 0
+    if window_type == None:
+        window_type = 'hann'
+    if scaling == None:
+        scaling = 'density'
+    window = int(window)
+    step = welch_step(window, overlap)
 
-    # Define window onset based on selected window and overlap
-    onsets = np.arange(0, int(len(signal)-window), int(overlap))
+    # Read all segments as a strided view (shape: segments x channels x window)
+    data = np.moveaxis(signal, axis, 0)
+    segments = welch_segments(data, window, step)
+    num_segments = np.shape(segments)[0]
+    if num_segments == 0:
+        raise ValueError('Signal is shorter than the window (%d frames).' %window)
+    if segment_chunk == None:
+        segment_chunk = num_segments
 
     # Define frequency spectrum as a vector (in Hz)
-    freq_spectr = np.linspace(0, sampling_rate/2, int(np.floor(window/2)+1))
+    freq_spectr = scipy.fft.rfftfreq(window, 1/sampling_rate)
 
-    # Define Hann window to minimize edge effects
+    # Define window to minimize edge effects
     # (i.e. filter signal by applying a progressive attenuation around the edges)
-    hannw = .5 - np.cos(2*np.pi*np.linspace(0, 1, int(window)))/2
-
-    # Initialize the power matrix (shape: windows x frequencies)
-    welch_power = np.zeros(len(freq_spectr))
-
-    # Apply Welch's method to signal
-    for i in range(0, len(onsets)):
-        # isolate a portion of the original signal
-        signal_portion = signal[onsets[i]:onsets[i]+int(window)]
-        # apply Hann window to taper signal around edges
-        signal_portion = signal_portion * hannw
-        # compute power
-        power = np.abs(scipy.fftpack.fft(signal_portion)/window)**2
-        # enter into matrix
-        welch_power = welch_power + power[0:len(freq_spectr)]
+    taper = spectral_window(window_type, window)
+
+    # Apply Welch's method to signal: sum power of all segments (segment_chunk segments at a time)
+    welch_power = np.zeros(np.shape(segments)[1:-1] + (len(freq_spectr),))
+    for start in range(0, num_segments, segment_chunk):
+        welch_power += np.sum(welch_periodograms(segments[start:start+segment_chunk], taper, sampling_rate, scaling), axis=0)
 
     # Divide by number of windows to obtain average
-    welch_power = welch_power / len(onsets)
+    welch_power /= num_segments
+
+    # Move frequencies to the time axis
+    welch_power = np.moveaxis(welch_power, -1, axis)
 
     # Plotting
     if plotting == 1:
-        # plot Hann window and random signal portion
+        # plot window and random signal portion
         plt.subplot(211)
-        plt.plot(hannw)
-        plt.xlim(0, len(hannw))
+        plt.plot(taper)
+        plt.xlim(0, len(taper))
         plt.ylabel('Amplitude')
-        plt.title('Hann window')
+        plt.title('Window (' + str(window_type) + ')')
 
         plt.subplot(212)
-        rand_idx = int((random.randrange(len(onsets))))
-        signal_sample = signal[onsets[rand_idx]:onsets[rand_idx]+int(window)]
+        rand_idx = np.random.randint(num_segments)
+        signal_sample = np.reshape(segments[rand_idx], (-1, window))[0]
         plt.plot(signal_sample, label='Original sample')
-        plt.plot(signal_sample * hannw, label='Hann')
+        plt.plot(signal_sample * taper, label='Tapered')
         plt.xlim(0, len(signal_sample))
         plt.ylabel('Amplitude')
         plt.legend()
-        plt.title('Edge effect attenuation using Hann window')
+        plt.title('Edge effect attenuation using window')
 
         plt.show()
 
-        # plot Static FFT and Welch's power spectra
-        sfft_freq_spectr = np.linspace(0, sampling_rate/2, int(np.floor(len(signal)/2)+1))
-        sfft_spectr = np.abs(scipy.fftpack.fft(signal)/len(signal))**2
-        plt.plot(sfft_freq_spectr, sfft_spectr[0:len(sfft_freq_spectr)], label='Static FFT')
-        plt.plot(freq_spectr, welch_power/10, label="Welch's method")
+        # plot Static FFT and Welch's power spectra (first channel)
+        first_channel = np.reshape(data, (np.shape(data)[0], -1))[:,0]
+        sfft_freq_spectr = scipy.fft.rfftfreq(len(first_channel), 1/sampling_rate)
+        sfft_spectr = np.abs(scipy.fft.rfft(first_channel)/len(first_channel))**2
+        plt.plot(sfft_freq_spectr, sfft_spectr, label='Static FFT')
+        plt.plot(freq_spectr, np.reshape(np.moveaxis(welch_power, axis, 0), (len(freq_spectr), -1))[:,0]/10, label="Welch's method")
         plt.xlim([0,40])
         plt.xlabel('Frequency [Hz]')
         plt.legend()
@@ -92,4 +112,205 @@ def welch_method(signal, sampling_rate=None, window=None, overlap=None, plotting
 
         plt.show()
 
-    return welch_power
+    return welch_power, freq_spectr
+
+def welch_step(window, overlap):
+    '''
+    Returns the number of frames between the onsets of two consecutive segments.
+    Input:
+        window: number of frames of each segment
+        overlap: number of frames where two consecutive segments overlap (0 <= overlap < window) [default = half of window]
+    Output:
+        step: number of frames between the onsets of two consecutive segments (window - overlap)
+    '''
+    if overlap is None:
+        overlap = window//2
+    overlap = int(overlap)
+    if overlap < 0 or overlap >= window:
+        raise ValueError('Overlap must be between 0 and window-1 frames (overlap = %d, window = %d).' %(overlap, window))
+
+    return window - overlap
+
+def welch_segments(data, window, step):
+    '''
+    Returns all segments of a time series as a read-only strided view (no copy).
+    Input:
+        data: nx... array with time as first axis
+        window: number of frames of each segment
+        step: number of frames between the onsets of two consecutive segments
+    Output:
+        segments: (number of segments)x...xwindow array (view of data)
+    '''
+    if np.shape(data)[0] < window:
+        return np.empty((0,) + np.shape(data)[1:] + (window,), dtype=data.dtype)
+
+    return sliding_window_view(data, window, axis=0)[::step]
+
+@functools.lru_cache(maxsize=128)
+def spectral_window(window_type, window):
+    '''
+    Generates (or retrieves from cache) the window used to taper each segment (periodic window, as used for spectral analysis).
+        Note: returned array is shared between calls and therefore read-only.
+    Input:
+        window_type: type of window (any window accepted by scipy.signal.get_window)
+        window: number of frames of the window
+    Output:
+        taper: (window,) array corresponding to the window
+    '''
+    taper = scipy.signal.get_window(window_type, window)
+    taper.flags.writeable = False
+
+    return taper
+
+def welch_periodograms(segments, taper, sampling_rate, scaling):
+    '''
+    Computes the one-sided power spectrum of each segment (tapered by the window) with a single batched real-input FFT.
+    Input:
+        segments: kx...xwindow array corresponding to the segments (e.g. output of welch_segments)
+        taper: (window,) array corresponding to the window
+        sampling_rate: sampling rate of the time series (Hz)
+        scaling: 'density' or 'spectrum'
+    Output:
+        power: kx...x(window/2+1) array corresponding to the power of each segment
+    '''
+    window = len(taper)
+    # Apply window to taper all segments around edges, then compute power
+    power = np.abs(scipy.fft.rfft(segments*taper, axis=-1))**2
+    # Scale (one-sided spectrum: negative frequencies folded)
+    power *= spectral_scale(taper, sampling_rate, scaling)
+    power[..., 1:window-window//2] *= 2
+
+    return power
+
+def spectral_scale(taper, sampling_rate, scaling):
+    '''
+    Returns the factor converting the squared FFT magnitude of a tapered segment into power spectral density or power spectrum.
+    Input:
+        taper: array corresponding to the window
+        sampling_rate: sampling rate of the time series (Hz)
+        scaling: 'density' or 'spectrum'
+    Output:
+        scale: scaling factor (two-sided)
+    '''
+    if scaling == 'density':
+        return 1/(sampling_rate*np.sum(taper**2))
+    elif scaling == 'spectrum':
+        return 1/np.sum(taper)**2
+    else:
+        raise ValueError('Unknown scaling: ' + str(scaling))
+
+# CLASS
+
+class StreamingWelch:
+    '''
+    Applies Welch's method to a time series acquired chunk by chunk (e.g. continuous EEG monitoring), updating the averaged power spectrum each time a new segment is complete.
+        Note: with averaging = 'running', the power spectrum is equal to welch_method applied to the concatenated chunks, up to round-off errors.
+        Note: memory does not depend on the duration of the recording (only the frames of the incomplete segments and the averaged power spectrum, or the last n_segments power spectra with averaging = 'sliding', are kept).
+    Input:
+        sampling_rate: corresponding sampling rate of the time series (i.e. how many frames per seconds, in Hz)
+        window: number of frames used to define the size of the window [default = sampling rate]
+        overlap: number of frames where two consecutive windows will overlap (0 <= overlap < window) [default = half of window]
+        window_type: type of window used to taper each segment (any window accepted by scipy.signal.get_window) [default = 'hann']
+        scaling: 'density' or 'spectrum' (see welch_method) [default = 'density']
+        averaging: select how the power spectra of the segments are averaged
+            'running': average of all segments since the start of the recording [default]
+            'exponential': exponentially weighted average (weight alpha for the newest segment)
+            'sliding': average of the last n_segments segments
+        alpha: weight of the newest segment for exponential averaging (between 0 and 1) [default = 0.1]
+        n_segments: number of segments averaged for sliding averaging [default = 10]
+    Attributes:
+        freq_spectr: (window/2+1)x1 array corresponding to the frequency vector (in Hz)
+        num_segments: number of segments processed since the last reset
+    Methods:
+        process(chunk): adds a new chunk (kx1 array, or kxm array for m channels) and returns the number of segments completed by this chunk
+        psd(): returns the current averaged power spectrum ((window/2+1)x1 array, or (window/2+1)xm array), None if no segment is complete yet
+        reset(): clears the buffered frames and the averaged power spectrum
+    Dependencies:
+        None
+    '''
+
+    def __init__(self, sampling_rate, window=None, overlap=None, window_type=None, scaling=None, averaging=None, alpha=None, n_segments=None):
+        # Deal with default values and potential missing input variables
+        if window == None:
+            window = sampling_rate
+        if window_type == None:
+            window_type = 'hann'
+        if scaling == None:
+            scaling = 'density'
+        if averaging == None:
+            averaging = 'running'
+        if alpha == None:
+            alpha = 0.1
+        if n_segments == None:
+            n_segments = 10
+        if averaging not in ('running', 'exponential', 'sliding'):
+            raise ValueError('Unknown averaging: ' + str(averaging))
+        self.sampling_rate = sampling_rate
+        self.window = int(window)
+        self.step = welch_step(self.window, overlap)
+        self.scaling = scaling
+        self.averaging = averaging
+        self.alpha = alpha
+        self.n_segments = int(n_segments)
+        self.taper = spectral_window(window_type, self.window)
+        self.freq_spectr = scipy.fft.rfftfreq(self.window, 1/sampling_rate)
+        self.reset()
+
+    def reset(self):
+        # Frames not yet included in a segment (i.e. overlap and incomplete segment)
+        self._tail = None
+        # Averaged power spectrum (running: sum of the power spectra, sliding: last n_segments power spectra)
+        self._power = None
+        self._sum = None
+        self.num_segments = 0
+
+    def process(self, chunk):
+        chunk = np.asarray(chunk, dtype=float)
+        if self._tail is None:
+            buf = chunk
+        else:
+            buf = np.concatenate((self._tail, chunk))
+        # Power spectrum of each completed segment
+        segments = welch_segments(buf, self.window, self.step)
+        num_new = np.shape(segments)[0]
+        # Keep frames of the next segments
+        self._tail = buf[num_new*self.step:]
+        if num_new == 0:
+            return 0
+        power = welch_periodograms(segments, self.taper, self.sampling_rate, self.scaling)
+        # Update average
+        if self.averaging == 'running':
+            if self._power is None:
+                self._power = np.zeros(np.shape(power)[1:])
+            self._power += np.sum(power, axis=0)
+        elif self.averaging == 'exponential':
+            if self._power is None:
+                # first segment initializes the average
+                self._power = power[0]
+                power = power[1:]
+            weights = self.alpha*(1-self.alpha)**np.arange(np.shape(power)[0]-1, -1, -1)
+            self._power = (1-self.alpha)**np.shape(power)[0]*self._power + np.tensordot(weights, power, axes=(0, 0))
+        else:
+            if self._power is None:
+                self._power = np.zeros((self.n_segments,) + np.shape(power)[1:])
+            # circular buffer of the last n_segments power spectra
+            last = power[-self.n_segments:]
+            self._power[(self.num_segments + num_new - np.shape(last)[0] + np.arange(np.shape(last)[0])) % self.n_segments] = last
+            # sum updated here so that psd() only scales it
+            self._sum = np.sum(self._power, axis=0)
+        self.num_segments += num_new
+
+        return num_new
+
+    def psd(self):
+        if self.num_segments == 0:
+            return None
+        if self.averaging == 'running':
+            welch_power = self._power / self.num_segments
+        elif self.averaging == 'exponential':
+            welch_power = self._power.copy()
+        else:
+            welch_power = self._sum / min(self.num_segments, self.n_segments)
+
+        # Move frequencies to the first axis
+        return np.moveaxis(welch_power, -1, 0)